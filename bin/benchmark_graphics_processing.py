@@ -0,0 +1,61 @@
+"""
+Times the graphics_processing functions against the polar_fox functions they replace.
+Run from the repo root: python3 bin/benchmark_graphics_processing.py
+Results are printed, not checked, as timings vary between machines (tests/test_graphics_processing.py checks the results are the same).
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join("src"))  # add to the module search path
+
+from polar_fox import constants
+from polar_fox import pixa
+from graphics_processing import pixa as fast_pixa
+
+
+def get_duration(function, *args):
+    # milliseconds per call, the fastest of several runs is the least affected by anything else running
+    number = 10
+    return min(timeit.repeat(lambda: function(*args), number=number, repeat=5)) * (
+        1000 / number
+    )
+
+
+def report(name, function, fast_function, *args):
+    print(
+        "[BENCHMARK GRAPHICS PROCESSING] "
+        + name
+        + ": "
+        + format(get_duration(function, *args), ".2f")
+        + "ms polar_fox, "
+        + format(get_duration(fast_function, *args), ".2f")
+        + "ms graphics_processing"
+    )
+
+
+def main():
+    # every bounding box of every cargo length, from one piece cargo spritesheet
+    piece_cargo_sprites = pixa.PieceCargoSprites(
+        constants, os.path.join("src", "polar_fox", "graphics")
+    )
+    input_image = next(iter(piece_cargo_sprites.sprites_by_filename.values()))
+    bounding_boxes = [
+        bounding_box
+        for length_bounding_boxes in (
+            piece_cargo_sprites.cargo_spritesheet_bounding_boxes.values()
+        )
+        for bounding_box in length_bounding_boxes
+    ]
+    report(
+        "get_arbitrary_angles (" + str(len(bounding_boxes)) + " sprites)",
+        pixa.get_arbitrary_angles,
+        fast_pixa.get_arbitrary_angles,
+        input_image,
+        bounding_boxes,
+    )
+
+
+if __name__ == "__main__":
+    main()
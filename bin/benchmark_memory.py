@@ -0,0 +1,97 @@
+"""
+Measures the peak resident size of the build, with and without __slots__ on the industry model classes (industry.py).
+Run from the repo root: python3 bin/benchmark_memory.py [number of runs]
+Each variant runs in a copy of src in a temporary dir, so the build outputs here aren't touched:
+- 'registry' imports firs, which registers every industry, cargo and economy (the fully loaded registry)
+- 'render nml' is a full render_nml run, in one process (no multiprocessing), from a clean generated dir
+The peak resident size of each run is read from the OS (ru_maxrss), the smallest of the runs is reported.
+"""
+
+import os
+import re
+import sys
+import shutil
+import subprocess
+import tempfile
+
+# the class body keeps a statement when its slots are removed, as some classes only declare slots
+slots_pattern = re.compile(r"^(\s*)__slots__ = \([^)]*\)\n", re.MULTILINE)
+
+measurements = {
+    "registry": ["-c", "import firs"],
+    "render nml": [os.path.join("src", "render_nml.py"), "", "True", ""],
+}
+
+
+def make_tree(tree_path, with_slots):
+    shutil.copytree(
+        "src",
+        os.path.join(tree_path, "src"),
+        ignore=shutil.ignore_patterns("__pycache__"),
+    )
+    if not with_slots:
+        industry_path = os.path.join(tree_path, "src", "industry.py")
+        with open(industry_path, "r", encoding="utf8") as industry_file:
+            industry_module = industry_file.read()
+        industry_module, count = slots_pattern.subn(r"\1pass\n", industry_module)
+        if count == 0:
+            raise Exception("no __slots__ found in industry.py, nothing to compare")
+        with open(industry_path, "w", encoding="utf8") as industry_file:
+            industry_file.write(industry_module)
+
+
+def get_peak_resident_size(tree_path, args):
+    # returns the peak resident size in KiB (ru_maxrss is KiB on linux, bytes on macOS)
+    # the render would otherwise reuse the nml from the previous run, only the compiled templates are kept
+    shutil.rmtree(os.path.join(tree_path, "generated"), ignore_errors=True)
+    env = dict(os.environ, PYTHONPATH=os.path.join(tree_path, "src"))
+    process = subprocess.Popen(
+        [sys.executable] + args,
+        cwd=tree_path,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    pid, status, rusage = os.wait4(process.pid, 0)
+    if status != 0:
+        raise Exception(" ".join(args) + " failed in " + tree_path)
+    if sys.platform == "darwin":
+        return rusage.ru_maxrss // 1024
+    return rusage.ru_maxrss
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_path:
+        for variant, with_slots in [("with slots", True), ("without slots", False)]:
+            tree_path = os.path.join(temp_path, variant.replace(" ", "_"))
+            make_tree(tree_path, with_slots)
+            # the first render compiles the templates, which later runs load from the template cache, so it isn't measured
+            get_peak_resident_size(tree_path, measurements["render nml"])
+            for measurement, args in measurements.items():
+                results[(variant, measurement)] = min(
+                    get_peak_resident_size(tree_path, args) for i in range(runs)
+                )
+    for measurement in measurements:
+        with_slots = results[("with slots", measurement)]
+        without_slots = results[("without slots", measurement)]
+        # small differences are within the run to run noise, so either sign can show up
+        difference = str(abs(without_slots - with_slots)) + (
+            " KiB smaller" if without_slots >= with_slots else " KiB larger"
+        )
+        print(
+            "[BENCHMARK MEMORY] "
+            + measurement
+            + ": peak resident size "
+            + str(without_slots)
+            + " KiB without slots, "
+            + str(with_slots)
+            + " KiB with slots ("
+            + difference
+            + ")"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -74,14 +74,14 @@ class Cargo(object):
 
         # guard against overlapping icon indices, icons should be unique per cargo
         # if two cargos use same icon (1) don't, copy-paste, then adjust some pixels for one of them (2) see 1
-        for cargo in registered_cargos:
-            if cargo.icon_indices == self.icon_indices:
-                utils.echo_message(
-                    "Cargo "
-                    + self.id
-                    + " has overlapping icon_indices with cargo "
-                    + cargo.id
-                )
+        cargo = registered_cargos.get("icon_indices", tuple(self.icon_indices))
+        if cargo is not None:
+            utils.echo_message(
+                "Cargo "
+                + self.id
+                + " has overlapping icon_indices with cargo "
+                + cargo.id
+            )
 
     def get_numeric_id(self, economy):
         return self.economy_variations[economy].get("numeric_id")
@@ -1,4 +1,10 @@
-registered_cargos = []
+from registry import Registry
+
+registered_cargos = Registry(
+    id=lambda cargo: cargo.id,
+    cargo_label=lambda cargo: cargo.cargo_label,
+    icon_indices=lambda cargo: tuple(cargo.icon_indices),
+)
 
 # keep these alphabetised for ease of maintaining
 from cargos import acid
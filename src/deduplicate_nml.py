@@ -0,0 +1,101 @@
+"""
+Many switches in firs.nml are identical apart from their names, e.g. the same location check or animation switch for several industries.
+This keeps the first of each set of identical switches, removes the others, and renames references to the removed switches.
+Switches must be declared before they're used, so when a switch is reached, every switch it refers to has already been handled,
+which means switches that only differ by referring to identical switches are found in the same single pass.
+"""
+
+import re
+import hashlib
+
+# switch (FEATURE, SCOPE, name, ... at the start of a line, or straight after the end of a previous block
+switch_header_pattern = re.compile(
+    r"(?:^[ \t]*|(?<=}))switch\s*\(\s*(\w+)\s*,\s*(\w+)\s*,\s*(\w+)\s*,", re.M
+)
+braces_pattern = re.compile(r"[{}]")
+# strings are matched so they can be skipped, identifiers in strings (e.g. graphics file paths) aren't references
+identifier_pattern = re.compile(r'"[^"\n]*"|[A-Za-z_]\w*')
+comment_pattern = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+whitespace_pattern = re.compile(r"\s+")
+
+
+def get_block_end(nml, start):
+    # position after the '}' matching the first '{' from start
+    depth = 0
+    for brace in braces_pattern.finditer(nml, nml.index("{", start)):
+        if brace.group(0) == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return brace.end()
+    raise Exception("Unbalanced braces in nml switch at position " + str(start))
+
+
+class SwitchDeduplicator(object):
+    """
+    Deduplicates the switches in a sequence of nml files (the files firs.nml is linked from), one file at a time, in link order.
+    Switches in later files are compared with the switches kept from earlier files, so the result is the same as deduplicating the linked nml.
+    Only the switch names and a hash of each kept switch are held between files, not the nml.
+    """
+
+    def __init__(self):
+        # removed switch name -> name of the identical switch that is kept
+        self.renames = {}
+        # md5 of the switch without its name, comments and whitespace -> name of the switch that is kept
+        self.kept_switches = {}
+        self.switch_names = set()
+        self.removed_count = 0
+
+    def rename(self, match):
+        return self.renames.get(match.group(0), match.group(0))
+
+    def rename_references(self, nml_text):
+        if len(self.renames) == 0:
+            return nml_text
+        return identifier_pattern.sub(self.rename, nml_text)
+
+    def deduplicate(self, nml):
+        # returns the nml without the switches that are identical to a switch already kept
+        result = []
+        position = 0
+        for header in switch_header_pattern.finditer(nml):
+            if header.start() < position:
+                # 'switch (' inside a switch already handled
+                continue
+            name = header.group(3)
+            # references to a removed switch are renamed to the kept switch, which is only safe if names aren't reused
+            if name in self.switch_names:
+                raise Exception(
+                    "Switch "
+                    + name
+                    + " is declared more than once, nml can't be deduplicated"
+                )
+            self.switch_names.add(name)
+            end = get_block_end(nml, header.end())
+            result.append(self.rename_references(nml[position : header.start()]))
+            switch = self.rename_references(nml[header.start() : end])
+            position = end
+            # the key leaves out the name, which is only in the header (switches can't refer to themselves)
+            name_start = header.start(3) - header.start()
+            key = switch[0:name_start] + switch[name_start + len(name) :]
+            key = whitespace_pattern.sub(" ", comment_pattern.sub("", key)).strip()
+            key = hashlib.md5(key.encode("utf8")).digest()
+            if key in self.kept_switches:
+                self.renames[name] = self.kept_switches[key]
+                self.removed_count += 1
+                # don't leave an empty line
+                if nml.startswith("\n", position):
+                    position += 1
+            else:
+                self.kept_switches[key] = name
+                result.append(switch)
+        result.append(self.rename_references(nml[position:]))
+        return "".join(result)
+
+
+def deduplicate_switches(nml):
+    # returns the deduplicated nml, and the number of switches removed
+    switch_deduplicator = SwitchDeduplicator()
+    nml = switch_deduplicator.deduplicate(nml)
+    return nml, switch_deduplicator.removed_count
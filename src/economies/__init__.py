@@ -1,4 +1,9 @@
-registered_economies = []
+from registry import Registry
+
+registered_economies = Registry(
+    id=lambda economy: economy.id,
+    numeric_id=lambda economy: economy.numeric_id,
+)
 
 # specify economies in the order that they should appear in parameter list in-game (and also in docs)
 # economies have a numeric ID which maps parameter values and avoids breaking savegames when this list changes
@@ -12,14 +12,11 @@ class Economy(object):
 
     def register(self):
         # guard, duplicate numeric IDs don't work :P
-        for economy in registered_economies:
-            if self.numeric_id == economy.numeric_id:
-                raise Exception(
-                    "Economy "
-                    + self.id
-                    + " has same numeric ID as economy "
-                    + economy.id
-                )
+        economy = registered_economies.get("numeric_id", self.numeric_id)
+        if economy is not None:
+            raise Exception(
+                "Economy " + self.id + " has same numeric ID as economy " + economy.id
+            )
         registered_economies.append(self)
 
     def forcibly_space_cargo_price_factors(self, registered_cargos):
@@ -28,9 +25,9 @@ class Economy(object):
         # designed to be called from template, easiest way to ensure registered_cargos is in scope and complete
         cargos_by_price_factor = []
         for cargo_id in self.cargo_ids:
-            for cargo in registered_cargos:
-                if cargo_id == cargo.id:
-                    cargos_by_price_factor.append(cargo)
+            cargo = registered_cargos.get("id", cargo_id)
+            if cargo is not None:
+                cargos_by_price_factor.append(cargo)
         cargos_by_price_factor = sorted(
             cargos_by_price_factor, key=lambda cargo: cargo.price_factor
         )
@@ -6,6 +6,8 @@
 """
 
 import os
+import json
+import hashlib
 
 currentdir = os.curdir
 
@@ -13,14 +15,14 @@ import global_constants
 import utils
 
 # setting up a cache for compiled chameleon templates can significantly speed up template rendering
-chameleon_cache_path = os.path.join(currentdir, global_constants.chameleon_cache_dir)
-if not os.path.exists(chameleon_cache_path):
-    os.mkdir(chameleon_cache_path)
-os.environ["CHAMELEON_CACHE"] = chameleon_cache_path
+import template_cache
 
-generated_files_path = os.path.join(currentdir, global_constants.generated_files_dir)
-if not os.path.exists(generated_files_path):
-    os.mkdir(generated_files_path)
+chameleon_cache_path = template_cache.chameleon_cache_path
+
+# imported before anything that imports chameleon, as profiling instruments chameleon's macro calls
+import profiling
+
+generated_files_path = utils.get_generated_files_path()
 
 import cargos
 
@@ -29,9 +31,73 @@ import industries
 
 registered_industries = industries.registered_industries
 import economies
+import incidence
 
 registered_economies = economies.registered_economies
 
+# incompatible industries are cached, so a test industry build can find them without registering every industry
+incompatible_industries_cache_path = os.path.join(
+    generated_files_path, "incompatible_industries.json"
+)
+
+
+def get_incompatible_industries_inputs_hash():
+    # content hash of everything the cross references are built from
+    inputs_hash = hashlib.md5()
+    utils.update_hash_from_files(
+        inputs_hash,
+        utils.get_src_file_paths(
+            [
+                "firs.py",
+                "incidence.py",
+                "industry.py",
+                "industries",
+                "economy.py",
+                "economies",
+            ]
+        ),
+    )
+    return inputs_hash.hexdigest()
+
+
+def get_test_industry_closure(test_industry):
+    # a test industry's nml only needs the test industry, and the industries it's incompatible with (for location checks)
+    # other industries in location checks are only referred to by numeric id, which comes from global_constants
+    # returns None (register all industries) if the incompatible industries cache is missing or out of date
+    if not test_industry or not os.path.exists(incompatible_industries_cache_path):
+        return None
+    with open(incompatible_industries_cache_path, "r", encoding="utf8") as cache_file:
+        cache = json.load(cache_file)
+    if cache["inputs_hash"] != get_incompatible_industries_inputs_hash():
+        return None
+    if test_industry not in cache["incompatible_industry_ids"]:
+        return None
+    return [test_industry] + cache["incompatible_industry_ids"][test_industry]
+
+
+def save_incompatible_industries_cache():
+    cache = {
+        "inputs_hash": get_incompatible_industries_inputs_hash(),
+        "incompatible_industry_ids": {
+            industry.id: sorted(
+                incompatible_industry.id
+                for incompatible_industry in incompatible_industries[industry]
+            )
+            for industry in registered_industries
+        },
+    }
+    with open(incompatible_industries_cache_path, "w", encoding="utf8") as cache_file:
+        json.dump(cache, cache_file, indent=4, sort_keys=True)
+
+
+# render_nml with a test industry only registers the industries that test industry needs
+# the registry is built on import, so render_nml passes the test industry by environment (the same way chameleon is configured)
+test_industry_closure = get_test_industry_closure(
+    os.environ.get("FIRS_TEST_INDUSTRY_CLOSURE", None)
+)
+with profiling.span("register industries"):
+    industries.register_industries(test_industry_closure)
+
 # guard against mistakes with cargo ids in economies
 known_cargo_ids = [cargo.id for cargo in registered_cargos]
 for economy in registered_economies:
@@ -47,53 +113,55 @@ for economy in registered_economies:
 # cargo production and incompatibility lists have to be done after all industries, economies and cargos are registered
 # this means they have to live here, which isn't ideal, but eh
 industries_producing_cargo = {}
-for cargo in registered_cargos:
-    industries_producing_cargo[cargo.cargo_label] = []
-
-for industry in registered_industries:
-    produced = []
-    for economy in registered_economies:
-        for cargo_label, ratio in industry.get_prod_cargo_types(economy):
-            produced.append(cargo_label)
-    for cargo_label in set(produced):
-        industries_producing_cargo[cargo_label].append(industry)
-
 industries_accepting_cargo = {}
-for cargo in registered_cargos:
-    industries_accepting_cargo[cargo.cargo_label] = []
+incompatible_industries = {}
+# economy -> industry x cargo incidence matrix, for anything that needs production and acceptance per economy
+economy_incidence_matrices = {}
+# special case supplies, pax, mail to exclude them from incompatibility (not useful in checks)
+incompatibility_excluded_cargo_labels = ["ENSP", "FMSP", "PASS", "MAIL"]
 
-for industry in registered_industries:
-    accepted = []
-    for economy in registered_economies:
-        for cargo_label in industry.get_accept_cargo_types(economy):
-            accepted.append(cargo_label)
-    for cargo_label in set(accepted):
-        industries_accepting_cargo[cargo_label].append(industry)
 
-incompatible_industries = {}
-for industry in registered_industries:
-    incompatible = []
-    # special case supplies, pax, mail to exclude them (not useful in checks)
-    excluded_cargos = ["ENSP", "FMSP", "PASS", "MAIL"]
-    for cargo, prod_industries in industries_producing_cargo.items():
-        if cargo not in excluded_cargos:
-            if industry in prod_industries:
-                incompatible.extend(industries_accepting_cargo[cargo])
-    for cargo, accept_industries in industries_accepting_cargo.items():
-        # special case supplies, pax, mail to exclude them (not useful in checks)
-        if cargo not in excluded_cargos:
-            if industry in accept_industries:
-                incompatible.extend(industries_producing_cargo[cargo])
-    incompatible_industries[industry] = set(incompatible)
-
-# guard against unused / wasted industry IDs
-# n.b. sometimes there are valid unused IDs during development
-# note also that tile ID should be cleaned up if removing an industry id
-for industry_id, industry_numeric_id in global_constants.industry_numeric_ids.items():
-    found = False
-    for industry in registered_industries:
-        if industry_id == industry.id:
-            found = True
-            break
-    if found == False:
-        utils.echo_message("Not found: " + industry_id + " from global_constants")
+def build_cross_references():
+    # the dicts are cleared and refilled in place, as render scripts hold references to them
+    # (watch mode calls this again after reloading industries or cargos)
+    cargo_labels = [cargo.cargo_label for cargo in registered_cargos]
+    economy_incidence_matrices.clear()
+    for economy in registered_economies:
+        economy_incidence_matrices[economy] = incidence.IncidenceMatrix.for_economy(
+            registered_industries, cargo_labels, economy
+        )
+    # cross references are for all economies
+    incidence_matrix = incidence.IncidenceMatrix.union(
+        registered_industries, cargo_labels, economy_incidence_matrices.values()
+    )
+
+    industries_producing_cargo.clear()
+    industries_producing_cargo.update(incidence_matrix.industries_producing_cargo())
+
+    industries_accepting_cargo.clear()
+    industries_accepting_cargo.update(incidence_matrix.industries_accepting_cargo())
+
+    incompatible_industries.clear()
+    incompatible_industries.update(
+        incidence_matrix.incompatible_industries(incompatibility_excluded_cargo_labels)
+    )
+
+
+with profiling.span("build cross references"):
+    # with a test industry closure, only the test industry's incompatible industries are complete, but that's all that's needed
+    build_cross_references()
+
+if test_industry_closure is None:
+    save_incompatible_industries_cache()
+
+    # guard against unused / wasted industry IDs
+    # n.b. sometimes there are valid unused IDs during development
+    # note also that tile ID should be cleaned up if removing an industry id
+    for industry_id in global_constants.industry_numeric_ids:
+        found = False
+        for industry in registered_industries:
+            if industry_id == industry.id:
+                found = True
+                break
+        if found == False:
+            utils.echo_message("Not found: " + industry_id + " from global_constants")
@@ -0,0 +1,8 @@
+"""
+FIRS versions of the polar_fox graphics processing functions and units.
+polar_fox is generated from the Polar Fox project and mustn't be edited here, so these wrap or subclass it instead.
+Results are the same as the polar_fox versions, which are used as the fallback where these can't help (e.g. numpy isn't installed).
+render_graphics only uses graphics_units.fuse_recolour_units.
+pixa.pixascan, pixa.pixascan_array and pixa.get_arbitrary_angles aren't used by any build stage yet, as FIRS doesn't scan or composite sprites;
+they're for units that do, as the Polar Fox vehicle sets have (only tests/test_graphics_processing.py and the benchmark call them for now).
+"""
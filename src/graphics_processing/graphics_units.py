@@ -0,0 +1,112 @@
+from polar_fox import graphics_units
+
+# recolour tables are cached by the content of their recolour maps, as the same maps are used by many units and pipelines
+recolour_tables = {}
+
+
+def get_recolour_map_key(recolour_map):
+    return tuple(sorted(recolour_map.items()))
+
+
+def get_recolour_table(recolour_map):
+    key = get_recolour_map_key(recolour_map)
+    if key not in recolour_tables:
+        table = list(range(256))
+        for i, colour in recolour_map.items():
+            table[i] = colour
+        recolour_tables[key] = table
+    return recolour_tables[key]
+
+
+class RecolourUnit(graphics_units.ProcessingUnit):
+    """
+    Base class for units that only map palette indexes to other palette indexes, using self.recolour_map.
+    Consecutive recolour units in a pipeline can be fused into one, see fuse_recolour_units.
+    """
+
+    def make_recolour_table(self, recolour_map):
+        return get_recolour_table(recolour_map)
+
+    def selective_recolour(self, spritesheet, recolour_map):
+        table = self.make_recolour_table(recolour_map)
+        # point makes a new image with the same palette, so no need to paste it back over the old one
+        spritesheet.sprites = spritesheet.sprites.point(table)
+        # doesn't need to return, the spritesheet object is already modified
+
+    def render(self, spritesheet):
+        self.selective_recolour(spritesheet, self.recolour_map)
+        return spritesheet
+
+
+class SimpleRecolour(RecolourUnit, graphics_units.SimpleRecolour):
+    """
+    As graphics_units.SimpleRecolour, with a cached recolour table and no paste.
+    """
+
+
+class SwapCompanyColours(RecolourUnit, graphics_units.SwapCompanyColours):
+    """
+    As graphics_units.SwapCompanyColours, with a cached recolour table and no paste.
+    """
+
+
+class FusedRecolour(RecolourUnit):
+    """
+    Applies several recolour maps, in order, in a single pass over the spritesheet.
+    """
+
+    def __init__(self, recolour_maps):
+        self.recolour_map = get_fused_recolour_map(recolour_maps)
+        super().__init__()
+
+
+# fused recolour maps are cached by the content of the maps they're made from
+fused_recolour_maps = {}
+
+
+def get_fused_recolour_map(recolour_maps):
+    key = tuple(get_recolour_map_key(recolour_map) for recolour_map in recolour_maps)
+    if key not in fused_recolour_maps:
+        # each colour goes through each map in turn
+        table = list(range(256))
+        for recolour_map in recolour_maps:
+            recolour_table = get_recolour_table(recolour_map)
+            table = [recolour_table[colour] for colour in table]
+        # only the colours that change are kept, same as any other recolour map
+        fused_recolour_maps[key] = {
+            i: colour for i, colour in enumerate(table) if colour != i
+        }
+    return fused_recolour_maps[key]
+
+
+# the polar_fox units that only recolour, so they can be fused too
+recolour_unit_classes = (
+    RecolourUnit,
+    graphics_units.SimpleRecolour,
+    graphics_units.SwapCompanyColours,
+)
+
+
+def fuse_recolour_units(units):
+    # returns the units for a pipeline, with each run of consecutive recolour units replaced by one FusedRecolour unit
+    # call this when the pipeline is constructed, so each run of recolours is one pass over the spritesheet when rendered
+    result = []
+    recolour_units = []
+    for unit in units + [None]:
+        if isinstance(unit, recolour_unit_classes):
+            recolour_units.append(unit)
+            continue
+        if len(recolour_units) == 1:
+            # nothing to fuse
+            result.append(recolour_units[0])
+        elif len(recolour_units) > 1:
+            fused_recolour = FusedRecolour(
+                [recolour_unit.recolour_map for recolour_unit in recolour_units]
+            )
+            # recolours can cancel out (e.g. swapping company colours twice), then no pass is needed at all
+            if len(fused_recolour.recolour_map) > 0:
+                result.append(fused_recolour)
+        recolour_units = []
+        if unit is not None:
+            result.append(unit)
+    return result
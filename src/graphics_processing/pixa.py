@@ -0,0 +1,126 @@
+from PIL import Image
+
+from polar_fox import pixa
+
+try:
+    # numpy is optional, without it the polar_fox functions are used, which give the same results (slowly)
+    import numpy
+except ImportError:
+    numpy = None
+
+# maps palette index 0 (blue, transparent) to 0 and all other pixels to 255, for making masks
+mask_lut = [0] + [255] * 255
+
+
+class PieceCargoSprites(pixa.PieceCargoSprites):
+    """
+    As pixa.PieceCargoSprites, but slices the sprites with get_arbitrary_angles below
+    """
+
+    def get_cargo_sprites_all_angles_for_length(self, cargo_filename, length):
+        return get_arbitrary_angles(
+            self.sprites_by_filename[cargo_filename],
+            self.cargo_spritesheet_bounding_boxes[length],
+        )
+
+
+def get_arbitrary_angles(input_image, bounding_boxes):
+    # as pixa.get_arbitrary_angles, a list of two tuples with sprite and mask for each bounding box
+    # crop returns a new image, so the input image doesn't need copying first
+    if (
+        numpy is not None
+        and input_image.mode in ("P", "L")
+        and all(
+            bounding_box_is_inside_image(input_image, bounding_box)
+            for bounding_box in bounding_boxes
+        )
+    ):
+        # the mask is made for the whole image in one pass, each sprite's mask is then just a slice of it
+        # (crop pads boxes that extend past the image, slices don't, hence only boxes inside the image)
+        significant_pixels = numpy.asarray(input_image) != 0
+        return [
+            (
+                input_image.crop(bounding_box),
+                Image.fromarray(
+                    significant_pixels[
+                        bounding_box[1] : bounding_box[3],
+                        bounding_box[0] : bounding_box[2],
+                    ]
+                ),
+            )
+            for bounding_box in bounding_boxes
+        ]
+    result = []
+    for bounding_box in bounding_boxes:
+        sprite = input_image.crop(bounding_box)
+        # the lut is applied per band, converting to a 1 bit mask after (not in point) also drops the palette, as pixa does
+        mask = sprite.point(mask_lut * len(sprite.getbands())).convert("1")
+        result.append((sprite, mask))
+    return result
+
+
+def bounding_box_is_inside_image(image, bounding_box):
+    return (
+        0 <= bounding_box[0] <= bounding_box[2] <= image.size[0]
+        and 0 <= bounding_box[1] <= bounding_box[3] <= image.size[1]
+    )
+
+
+def get_significant_pixel_indexes(image):
+    # x, y and colour arrays of the significant pixels, columns first (x, then y), as pixa.pixascan orders them
+    pixels = numpy.asarray(image)
+    # transposed, so that nonzero walks the pixels columns first
+    pixels = pixels.T
+    xs, ys = numpy.nonzero((pixels != 0) & (pixels != 255))
+    return xs, ys, pixels[xs, ys]
+
+
+def pixascan(image):
+    """
+    As pixa.pixascan, but scans the image with numpy when it can.
+
+    @param image: Source image.
+    @type  image: L{PIL.Image}
+
+    @return: Significant pixels in the image (top-left to bottom-right, columns first).
+    @rtype:  A C{list} of C{tuple} (x, y, colour)
+    """
+    # numpy only handles single band (palette or greyscale) images here, other images have tuples of colour bands per pixel
+    if numpy is None or image.mode not in ("P", "L"):
+        return pixa.pixascan(image)
+    xs, ys, colours = get_significant_pixel_indexes(image)
+    return list(zip(xs.tolist(), ys.tolist(), colours.tolist()))
+
+
+def pixascan_array(image):
+    """
+    As pixascan, but returns the significant pixels as a numpy structured array,
+    which is much more compact than a list of tuples, for reuse in multiple render passes.
+    Requires numpy.
+
+    @param image: Source image, palette or greyscale.
+    @type  image: L{PIL.Image}
+
+    @return: Significant pixels in the image (top-left to bottom-right, columns first).
+    @rtype:  C{numpy.ndarray} with fields x, y, colour
+    """
+    if numpy is None:
+        raise Exception("pixascan_array requires numpy, use pixascan instead")
+    if image.mode not in ("P", "L"):
+        raise Exception(
+            "pixascan_array requires a palette or greyscale image, not " + image.mode
+        )
+    xs, ys, colours = get_significant_pixel_indexes(image)
+    # 16 bit coordinates are plenty for spritesheets, but don't overflow on anything bigger
+    if max(image.size) <= 65536:
+        coordinate_type = numpy.uint16
+    else:
+        coordinate_type = numpy.uint32
+    significant_pixels = numpy.empty(
+        len(xs),
+        dtype=[("x", coordinate_type), ("y", coordinate_type), ("colour", numpy.uint8)],
+    )
+    significant_pixels["x"] = xs
+    significant_pixels["y"] = ys
+    significant_pixels["colour"] = colours
+    return significant_pixels
@@ -0,0 +1,86 @@
+"""
+  This file is part of FIRS Industry Set for OpenTTD.
+  FIRS is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+  FIRS is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+  See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with FIRS. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+class IncidenceMatrix(object):
+    """
+    Industry x cargo incidence for production and acceptance, stored as one python int bitset per cargo column.
+    Bit n of a column is set if industry n (in the order the industries were given) produces (or accepts) the cargo.
+    Combining columns with | and & handles all industries at once, without looping over industries in python.
+    """
+
+    def __init__(self, industries, cargo_labels):
+        self.industries = list(industries)
+        self.cargo_labels = list(cargo_labels)
+        self.produce = {cargo_label: 0 for cargo_label in self.cargo_labels}
+        self.accept = {cargo_label: 0 for cargo_label in self.cargo_labels}
+
+    @classmethod
+    def for_economy(cls, industries, cargo_labels, economy):
+        matrix = cls(industries, cargo_labels)
+        for row, industry in enumerate(matrix.industries):
+            bit = 1 << row
+            for cargo_label, ratio in industry.get_prod_cargo_types(economy):
+                matrix.produce[cargo_label] |= bit
+            for cargo_label in industry.get_accept_cargo_types(economy):
+                matrix.accept[cargo_label] |= bit
+        return matrix
+
+    @classmethod
+    def union(cls, industries, cargo_labels, matrices):
+        # industry produces (or accepts) a cargo in any of the matrices, e.g. in any economy
+        matrix = cls(industries, cargo_labels)
+        for other in matrices:
+            for cargo_label in matrix.cargo_labels:
+                matrix.produce[cargo_label] |= other.produce[cargo_label]
+                matrix.accept[cargo_label] |= other.accept[cargo_label]
+        return matrix
+
+    def get_industries(self, bitset):
+        # rows of the set bits, in industry order
+        result = []
+        while bitset:
+            low_bit = bitset & -bitset
+            result.append(self.industries[low_bit.bit_length() - 1])
+            bitset ^= low_bit
+        return result
+
+    def industries_producing_cargo(self):
+        return {
+            cargo_label: self.get_industries(self.produce[cargo_label])
+            for cargo_label in self.cargo_labels
+        }
+
+    def industries_accepting_cargo(self):
+        return {
+            cargo_label: self.get_industries(self.accept[cargo_label])
+            for cargo_label in self.cargo_labels
+        }
+
+    def incompatible_industries(self, excluded_cargo_labels):
+        # equivalent to the boolean matrix product (produce . accept^T) | (accept . produce^T), with excluded cargo columns masked out
+        # industries are incompatible if one produces a cargo that the other accepts
+        incompatible = [0] * len(self.industries)
+        for cargo_label in self.cargo_labels:
+            if cargo_label in excluded_cargo_labels:
+                continue
+            produce = self.produce[cargo_label]
+            accept = self.accept[cargo_label]
+            # only the industries that produce or accept this cargo need visiting
+            bitset = produce | accept
+            while bitset:
+                low_bit = bitset & -bitset
+                row = low_bit.bit_length() - 1
+                if produce & low_bit:
+                    incompatible[row] |= accept
+                if accept & low_bit:
+                    incompatible[row] |= produce
+                bitset ^= low_bit
+        return {
+            industry: set(self.get_industries(incompatible[row]))
+            for row, industry in enumerate(self.industries)
+        }
@@ -1,477 +1,132 @@
-registered_industries = []
+import importlib
 
-# keep these alphabetised for ease of maintaining
-
-"""
-from industries import aluminium_plant
-aluminium_plant.industry.register()
-"""
-
-""" BLTC
-from industries import ammonia_plant
-ammonia_plant.industry.register()
-"""
-
-from industries import arable_farm
-
-arable_farm.industry.register()
-
-from industries import assembly_plant
-
-assembly_plant.industry.register()
-
-from industries import basic_oxygen_furnace
-
-basic_oxygen_furnace.industry.register()
-
-"""
-from industries import biorefinery
-biorefinery.industry.register()
-"""
-
-from industries import blast_furnace
-
-blast_furnace.industry.register()
-
-from industries import body_plant
-
-body_plant.industry.register()
-
-from industries import brewery
-
-brewery.industry.register()
-
-"""
-from industries import brick_works
-brick_works.industry.register()
-"""
-
-from industries import builders_yard
-
-builders_yard.industry.register()
-
-from industries import bulk_terminal
-
-bulk_terminal.industry.register()
-
-from industries import carbon_black_plant
-
-carbon_black_plant.industry.register()
-
-from industries import cement_plant
-
-cement_plant.industry.register()
-
-from industries import chemical_plant
-
-chemical_plant.industry.register()
-
-from industries import chlor_alkali_plant
-
-chlor_alkali_plant.industry.register()
-
-""" BLTC
-from industries import civil_explosives_facility
-civil_explosives_facility.industry.register()
-"""
-
-"""
-from industries import chromite_mine
-chromite_mine.industry.register()
-"""
-
-from industries import clay_pit
-
-clay_pit.industry.register()
-
-from industries import coal_mine
-
-coal_mine.industry.register()
-
-from industries import coffee_estate
-
-coffee_estate.industry.register()
-
-from industries import coke_oven
-
-coke_oven.industry.register()
-
-from industries import component_factory
-
-component_factory.industry.register()
-
-from industries import copper_mine
-
-copper_mine.industry.register()
-
-"""
-from industries import copper_concentrator
-copper_concentrator.industry.register()
-"""
-
-from industries import copper_refinery
-
-copper_refinery.industry.register()
-
-from industries import cryo_plant
-
-cryo_plant.industry.register()
-
-from industries import dairy
-
-dairy.industry.register()
-
-from industries import dairy_farm
-
-dairy_farm.industry.register()
-
-from industries import diamond_mine
-
-diamond_mine.industry.register()
-
-from industries import dredging_site
-
-dredging_site.industry.register()
-
-from industries import electric_arc_furnace
-
-electric_arc_furnace.industry.register()
-
-from industries import engine_plant
-
-engine_plant.industry.register()
-
-""" BLTC
-from industries import ethylene_cracker
-ethylene_cracker.industry.register()
-"""
-
-""" BLTC
-from industries import factory_1
-factory_1.industry.register()
-
-from industries import factory_2
-factory_2.industry.register()
-
-from industries import factory_3
-factory_3.industry.register()
-"""
-
-from industries import farm
-
-farm.industry.register()
-
-"""
-from industries import ferrochrome_smelter
-ferrochrome_smelter.industry.register()
-"""
-
-""" BLTC
-from industries import fertiliser_plant
-fertiliser_plant.industry.register()
-"""
-
-"""
-from industries import fischer_tropsch_plant
-fischer_tropsch_plant.industry.register()
-"""
-
-from industries import flour_mill
-
-flour_mill.industry.register()
-
-"""
-from industries import food_market
-food_market.industry.register()
-"""
-
-from industries import food_processor
-
-food_processor.industry.register()
-
-from industries import fish_farm
-
-fish_farm.industry.register()
-
-from industries import fishing_grounds
-
-fishing_grounds.industry.register()
-
-from industries import fishing_harbour
-
-fishing_harbour.industry.register()
-
-from industries import forest
-
-forest.industry.register()
-
-from industries import fruit_plantation
-
-fruit_plantation.industry.register()
-
-""" BLTC
-from industries import furniture_factory
-furniture_factory.industry.register()
-"""
-
-from industries import general_store
-
-general_store.industry.register()
-
-from industries import glass_works
-
-glass_works.industry.register()
-
-from industries import hardware_store
-
-hardware_store.industry.register()
-
-from industries import hotel
-
-hotel.industry.register()
+from registry import Registry
 
-from industries import herding_coop
+registered_industries = Registry(
+    id=lambda industry: industry.id,
+    numeric_id=lambda industry: industry.numeric_id,
+)
 
-herding_coop.industry.register()
-
-from industries import iron_ore_mine
-
-iron_ore_mine.industry.register()
-
-"""
-from industries import iron_works
-iron_works.industry.register()
-"""
-
-from industries import junk_yard
-
-junk_yard.industry.register()
-
-"""
-from industries import latex_processor
-latex_processor.industry.register()
-"""
-
-from industries import lime_kiln
-
-lime_kiln.industry.register()
-
-from industries import limestone_mine
-
-limestone_mine.industry.register()
-
-from industries import liquids_terminal
-
-liquids_terminal.industry.register()
-
-from industries import lumber_yard
-
-lumber_yard.industry.register()
-
-"""
-from industries import machine_shop
-machine_shop.industry.register()
-"""
-
-"""
-from industries import machine_works
-machine_works.industry.register()
-"""
-
-from industries import manganese_mine
-
-manganese_mine.industry.register()
-
-from industries import metal_workshop
-
-metal_workshop.industry.register()
-
-from industries import nitrate_mine
-
-nitrate_mine.industry.register()
-
-from industries import oil_wells
-
-oil_wells.industry.register()
-
-""" BLTC
-from industries import oil_refinery
-oil_refinery.industry.register()
-"""
-
-from industries import oil_rig
-
-oil_rig.industry.register()
-
-from industries import orchard_piggery
-
-orchard_piggery.industry.register()
-
-from industries import paper_mill
-
-paper_mill.industry.register()
-
-from industries import peatlands
-
-peatlands.industry.register()
-
-from industries import petrol_pump
-
-petrol_pump.industry.register()
-
-from industries import phosphate_mine
-
-phosphate_mine.industry.register()
-
-""" BLTC
-from industries import phosphoric_acid_plant
-phosphoric_acid_plant.industry.register()
-"""
-
-""" BLTC # should be one of the polymer plants (pvc?)
-from industries import plastics_plant
-plastics_plant.industry.register()
-"""
-
-""" BLTC
-from industries import polyethylene_plant
-polyethylene_plant.industry.register()
-
-from industries import polypropylene_plant
-polypropylene_plant.industry.register()
-"""
-
-from industries import port
-
-port.industry.register()
-
-from industries import power_plant
-
-power_plant.industry.register()
-
-from industries import potash_mine
-
-potash_mine.industry.register()
-
-from industries import pyrite_mine
-
-pyrite_mine.industry.register()
-
-from industries import pyrite_smelter
-
-pyrite_smelter.industry.register()
-
-from industries import quarry
-
-quarry.industry.register()
-
-from industries import ranch
-
-ranch.industry.register()
-
-"""
-from industries import recycling_depot
-recycling_depot.industry.register()
-"""
-
-"""
-from industries import recycling_plant
-recycling_plant.industry.register()
-"""
-
-from industries import rubber_plantation
-
-rubber_plantation.industry.register()
-
-""" BLTC
-from industries import salt_mine
-salt_mine.industry.register()
-"""
-
-from industries import sawmill
-
-sawmill.industry.register()
-
-"""
-from industries import sheep_farm
-sheep_farm.industry.register()
-"""
-
-from industries import sheet_and_pipe_mill
-
-sheet_and_pipe_mill.industry.register()
-
-from industries import slag_grinding_plant
-
-slag_grinding_plant.industry.register()
-
-from industries import soda_ash_mine
-
-soda_ash_mine.industry.register()
-
-""" BLTC
-from industries import solvay_plant
-solvay_plant.industry.register()
-"""
-
-"""
-from industries import smithy_forge
-smithy_forge.industry.register()
-"""
-
-"""
-from industries import steel_mill
-steel_mill.industry.register()
-"""
-
-from industries import stockyard
-
-stockyard.industry.register()
-
-"""
-from industries import sugar_refinery
-sugar_refinery.industry.register()
-"""
-
-""" BLTC
-from industries import sulphuric_acid_plant
-sulphuric_acid_plant.industry.register()
-"""
-
-from industries import supply_yard
-
-supply_yard.industry.register()
-
-""" BLTC
-from industries import textile_mill
-textile_mill.industry.register()
-"""
-
-""" BLTC
-from industries import tinplate_works
-tinplate_works.industry.register()
-"""
-
-from industries import trading_post
-
-trading_post.industry.register()
-
-from industries import tyre_plant
-
-tyre_plant.industry.register()
-
-from industries import vehicle_distributor
-
-vehicle_distributor.industry.register()
-
-from industries import vineyard
-
-vineyard.industry.register()
-
-from industries import wharf
-
-wharf.industry.register()
-
-from industries import wire_and_section_mill
-
-wire_and_section_mill.industry.register()
+# keep these alphabetised for ease of maintaining
+# industries are registered in this order, commented out industries aren't registered
+industry_module_names = [
+    # "aluminium_plant",
+    # "ammonia_plant",  # BLTC
+    "arable_farm",
+    "assembly_plant",
+    "basic_oxygen_furnace",
+    # "biorefinery",
+    "blast_furnace",
+    "body_plant",
+    "brewery",
+    # "brick_works",
+    "builders_yard",
+    "bulk_terminal",
+    "carbon_black_plant",
+    "cement_plant",
+    "chemical_plant",
+    "chlor_alkali_plant",
+    # "civil_explosives_facility",  # BLTC
+    # "chromite_mine",
+    "clay_pit",
+    "coal_mine",
+    "coffee_estate",
+    "coke_oven",
+    "component_factory",
+    "copper_mine",
+    # "copper_concentrator",
+    "copper_refinery",
+    "cryo_plant",
+    "dairy",
+    "dairy_farm",
+    "diamond_mine",
+    "dredging_site",
+    "electric_arc_furnace",
+    "engine_plant",
+    # "ethylene_cracker",  # BLTC
+    # "factory_1",  # BLTC
+    # "factory_2",  # BLTC
+    # "factory_3",  # BLTC
+    "farm",
+    # "ferrochrome_smelter",
+    # "fertiliser_plant",  # BLTC
+    # "fischer_tropsch_plant",
+    "flour_mill",
+    # "food_market",
+    "food_processor",
+    "fish_farm",
+    "fishing_grounds",
+    "fishing_harbour",
+    "forest",
+    "fruit_plantation",
+    # "furniture_factory",  # BLTC
+    "general_store",
+    "glass_works",
+    "hardware_store",
+    "hotel",
+    "herding_coop",
+    "iron_ore_mine",
+    # "iron_works",
+    "junk_yard",
+    # "latex_processor",
+    "lime_kiln",
+    "limestone_mine",
+    "liquids_terminal",
+    "lumber_yard",
+    # "machine_shop",
+    # "machine_works",
+    "manganese_mine",
+    "metal_workshop",
+    "nitrate_mine",
+    "oil_wells",
+    # "oil_refinery",  # BLTC
+    "oil_rig",
+    "orchard_piggery",
+    "paper_mill",
+    "peatlands",
+    "petrol_pump",
+    "phosphate_mine",
+    # "phosphoric_acid_plant",  # BLTC
+    # "plastics_plant",  # BLTC # should be one of the polymer plants (pvc?)
+    # "polyethylene_plant",  # BLTC
+    # "polypropylene_plant",  # BLTC
+    "port",
+    "power_plant",
+    "potash_mine",
+    "pyrite_mine",
+    "pyrite_smelter",
+    "quarry",
+    "ranch",
+    # "recycling_depot",
+    # "recycling_plant",
+    "rubber_plantation",
+    # "salt_mine",  # BLTC
+    "sawmill",
+    # "sheep_farm",
+    "sheet_and_pipe_mill",
+    "slag_grinding_plant",
+    "soda_ash_mine",
+    # "solvay_plant",  # BLTC
+    # "smithy_forge",
+    # "steel_mill",
+    "stockyard",
+    # "sugar_refinery",
+    # "sulphuric_acid_plant",  # BLTC
+    "supply_yard",
+    # "textile_mill",  # BLTC
+    # "tinplate_works",  # BLTC
+    "trading_post",
+    "tyre_plant",
+    "vehicle_distributor",
+    "vineyard",
+    "wharf",
+    "wire_and_section_mill",
+]
+
+
+def register_industries(industry_ids=None):
+    # industry ids are the same as the module names
+    # optionally only register some industries (e.g. for a test industry build), registration order is unchanged
+    for module_name in industry_module_names:
+        if industry_ids is None or module_name in industry_ids:
+            importlib.import_module("industries." + module_name).industry.register()
@@ -8,11 +8,13 @@
 from collections import deque
 
 import os.path
+import math
 
 currentdir = os.curdir
 
 import global_constants as global_constants
 import utils as utils
+import profiling
 
 from chameleon import PageTemplateLoader  # chameleon used in most template cases
 
@@ -28,15 +30,30 @@ from industries import registered_industries
 def get_another_industry(id):
     # utility function so that we can provide numeric ids in nml output, rather than relying identifiers
     # this enables compiling single-industries without nml barfing on missing identifiers (in location checks and such)
-    for industry in registered_industries:
-        if industry.id == id:
-            return industry
     # if none found, that's an error, don't handle the error, just blow up
+    return registered_industries.get("id", id)
 
 
 class Tile(object):
     """ Base class to hold industry tiles"""
 
+    # model objects are created by the thousand across all industries, slots keep them compact
+    __slots__ = (
+        "id",
+        "numeric_id",
+        "land_shape_flags",
+        "location_checks",
+        "_special_flags",
+        "foundations",
+        "autoslope",
+        "animation_length",
+        "animation_looping",
+        "animation_speed",
+        "custom_animation_next_frame",
+        "custom_animation_control",
+        "random_trigger",
+    )
+
     def __init__(self, industry_id, id, **kwargs):
         self.id = id
         self.numeric_id = global_constants.tile_numeric_ids[
@@ -99,9 +116,117 @@ class Tile(object):
         return template.macros
 
 
+def get_square_search_points(distance):
+    # every tile within distance, row by row
+    return [
+        (x, y)
+        for x in range(-1 * distance, distance + 1)
+        for y in range(-1 * distance, distance + 1)
+    ]
+
+
+def get_spiral_search_points(distance):
+    # every tile within distance (same tiles as square), nearest first, so the search ends sooner when houses are close
+    return sorted(
+        get_square_search_points(distance),
+        key=lambda point: (
+            point[0] ** 2 + point[1] ** 2,
+            math.atan2(point[1], point[0]),
+        ),
+    )
+
+
+def get_ring_search_points(distance, step=2):
+    # tiles on square rings every step tiles out to distance, nearest ring first; misses houses between the rings
+    return [
+        point
+        for point in get_spiral_search_points(distance)
+        if max(abs(point[0]), abs(point[1])) % step == 0
+    ]
+
+
+def get_lattice_search_points(distance, step=2):
+    # every step'th tile in both directions, nearest first; towns are contiguous blocks of houses, so few are missed
+    return [
+        point
+        for point in get_spiral_search_points(distance)
+        if point[0] % step == 0 and point[1] % step == 0
+    ]
+
+
+houses_nearby_search_patterns = {
+    "square": get_square_search_points,
+    "spiral": get_spiral_search_points,
+    "ring": get_ring_search_points,
+    "lattice": get_lattice_search_points,
+}
+# the keys each pattern takes in a search config, as arguments to the pattern function (besides pattern itself)
+houses_nearby_search_pattern_keys = {
+    "square": ["distance"],
+    "spiral": ["distance"],
+    "ring": ["distance", "step"],
+    "lattice": ["distance", "step"],
+}
+# used when require_houses_nearby is True, rather than a search config
+default_houses_nearby_search = dict(pattern="spiral", distance=7)
+# (pattern, distance, step) -> search points, the same for all tiles using the same search, so generated once
+houses_nearby_search_points = {}
+
+
+def get_houses_nearby_search_points(search, industry_id):
+    # search is a dict: pattern (key of houses_nearby_search_patterns), distance, and optionally step for ring or lattice
+    # search points are in the order they're checked
+    pattern = search.get("pattern", default_houses_nearby_search["pattern"])
+    distance = search.get("distance", default_houses_nearby_search["distance"])
+    step = search.get("step", None)
+    if pattern not in houses_nearby_search_patterns:
+        raise Exception(
+            industry_id
+            + " require_houses_nearby search pattern "
+            + str(pattern)
+            + " is not one of "
+            + ", ".join(houses_nearby_search_patterns)
+        )
+    for key in search:
+        if key != "pattern" and key not in houses_nearby_search_pattern_keys[pattern]:
+            raise Exception(
+                industry_id
+                + " require_houses_nearby search has "
+                + str(key)
+                + ", which the "
+                + pattern
+                + " pattern doesn't take (it takes "
+                + ", ".join(houses_nearby_search_pattern_keys[pattern])
+                + ")"
+            )
+    if (pattern, distance, step) not in houses_nearby_search_points:
+        if step is None:
+            search_points = houses_nearby_search_patterns[pattern](distance)
+        else:
+            search_points = houses_nearby_search_patterns[pattern](distance, step)
+        houses_nearby_search_points[(pattern, distance, step)] = tuple(search_points)
+    return houses_nearby_search_points[(pattern, distance, step)]
+
+
 class TileLocationChecks(object):
     """ Class to hold location checks for a tile """
 
+    __slots__ = (
+        "always_allow_founder",
+        "disallow_slopes",
+        "disallow_steep_slopes",
+        "disallow_industry_adjacent",
+        "require_effectively_flat",
+        "require_houses_nearby",
+        "require_road_adjacent",
+        "require_coast",
+        "disallow_above_snowline",
+        "disallow_below_snowline",
+        "disallow_desert",
+        "disallow_coast",
+        "render_trees",
+    )
+
     def __init__(self, **kwargs):
         self.always_allow_founder = kwargs.get(
             "always_allow_founder", True
@@ -112,6 +237,7 @@ class TileLocationChecks(object):
             "disallow_industry_adjacent", False
         )
         self.require_effectively_flat = kwargs.get("require_effectively_flat", False)
+        # True, or a dict to configure the search for houses, e.g. dict(pattern="lattice", distance=7, step=2), see houses_nearby_search_patterns
         self.require_houses_nearby = kwargs.get("require_houses_nearby", False)
         self.require_road_adjacent = kwargs.get("require_road_adjacent", False)
         self.require_coast = kwargs.get("require_coast", False)
@@ -119,8 +245,18 @@ class TileLocationChecks(object):
         self.disallow_below_snowline = kwargs.get("disallow_below_snowline", False)
         self.disallow_desert = kwargs.get("disallow_desert", False)
         self.disallow_coast = kwargs.get("disallow_coast", False)
+        # (tile id, industry id) -> render tree, as the tree is requested for each tile multiple times by Tile and by the templates
+        self.render_trees = {}
 
     def get_render_tree(self, tile_id, industry_id):
+        # the cached tree is a tuple, so callers can't change it for later callers
+        render_tree = self.render_trees.get((tile_id, industry_id), None)
+        if render_tree is None:
+            render_tree = self.build_render_tree(tile_id, industry_id)
+            self.render_trees[(tile_id, industry_id)] = render_tree
+        return render_tree
+
+    def build_render_tree(self, tile_id, industry_id):
         switch_prefix = tile_id + "_lc_"
         result = deque([])
 
@@ -144,15 +280,15 @@ class TileLocationChecks(object):
             result.append(TileLocationCheckRequireSlope())
 
         if self.require_houses_nearby:
-            # generates circular tile search points automatically
+            # generates tile search points automatically, from the search pattern
             # possibly could be done simpler with a town zone check instead of a tile search, but eh, it's done and works
-            # note that this automates the provision of tile locations for the search radius, no option to declare that per-industry
-            distance = 7
-            search_points = []
-            for x in range(-1 * distance, distance + 1):
-                for y in range(-1 * distance, distance + 1):
-                    search_points.append((x, y))
-            result.append(TileLocationCheckRequireHousesNearby(search_points))
+            result.append(
+                TileLocationCheckRequireHousesNearby(
+                    get_houses_nearby_search_points(
+                        self.houses_nearby_search, industry_id
+                    )
+                )
+            )
 
         if self.require_road_adjacent:
             result.append(TileLocationCheckRequireRoadAdjacent())
@@ -176,12 +312,21 @@ class TileLocationChecks(object):
             if count < len(result) - 1:
                 lc.switch_result = switch_prefix + str(count + 1)
 
-        return list(reversed(result))
+        return tuple(reversed(result))
+
+    @property
+    def houses_nearby_search(self):
+        if self.require_houses_nearby is True:
+            return default_houses_nearby_search
+        return self.require_houses_nearby
 
 
 class TileLocationCheck(object):
     """ Sparse class to base TileLocationCheck subclasses on """
 
+    # subclasses must also declare __slots__ (even if empty), or instances get a __dict__ anyway
+    __slots__ = ("switch_result", "switch_entry_point", "macro_name")
+
     @property
     def macro(self):
         return templates["location_check_macros_tile.pynml"].macros[self.macro_name]
@@ -193,6 +338,8 @@ class TileLocationCheckDisallowSlopes(TileLocationCheck):
     Not to be confused with TileLocationCheckRequireEffectivelyFlat
     """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = None  # no default value for this check, it may not be the last check in a chain
         self.switch_entry_point = None
@@ -202,6 +349,8 @@ class TileLocationCheckDisallowSlopes(TileLocationCheck):
 class TileLocationCheckDisallowSteepSlopes(TileLocationCheck):
     """ Prevent building on steep slopes (but not normal slopes) """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = None  # no default value for this check, it may not be the last check in a chain
         self.switch_entry_point = None
@@ -215,6 +364,8 @@ class TileLocationCheckDisallowIndustryAdjacent(TileLocationCheck):
     2. Not necessary for most town industries
     """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = None
@@ -229,6 +380,8 @@ class TileLocationCheckRequireEffectivelyFlat(TileLocationCheck):
     Not to be confused with TileLocationCheckDisallowSlopes
     """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = None  # no default value for this check, it may not be the last check in a chain
         self.switch_entry_point = None
@@ -236,7 +389,9 @@ class TileLocationCheckRequireEffectivelyFlat(TileLocationCheck):
 
 
 class TileLocationCheckRequireHousesNearby(TileLocationCheck):
-    """ Requires houses at offset x, y (to be fed by circular tile search) """
+    """ Requires houses at offset x, y (to be fed by tile search points, in the order they're checked) """
+
+    __slots__ = ("search_points",)
 
     def __init__(self, search_points):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
@@ -248,6 +403,8 @@ class TileLocationCheckRequireHousesNearby(TileLocationCheck):
 class TileLocationCheckRequireRoadAdjacent(TileLocationCheck):
     """ Requires road on adjacent tile(s), with configurable directions """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = None
@@ -255,6 +412,8 @@ class TileLocationCheckRequireRoadAdjacent(TileLocationCheck):
 
 
 class TileLocationCheckRequireSea(TileLocationCheck):
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = None
@@ -262,6 +421,8 @@ class TileLocationCheckRequireSea(TileLocationCheck):
 
 
 class TileLocationCheckRequireSlope(TileLocationCheck):
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = None
@@ -271,6 +432,8 @@ class TileLocationCheckRequireSlope(TileLocationCheck):
 class TileLocationCheckDisallowDesert(TileLocationCheck):
     """ Prevent building on desert tiles """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = None  # no default value for this check, it may not be the last check in a chain
         self.switch_entry_point = None
@@ -280,6 +443,8 @@ class TileLocationCheckDisallowDesert(TileLocationCheck):
 class TileLocationCheckDisallowCoast(TileLocationCheck):
     """ Prevent building on desert tiles """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = None  # no default value for this check, it may not be the last check in a chain
         self.switch_entry_point = None
@@ -289,6 +454,8 @@ class TileLocationCheckDisallowCoast(TileLocationCheck):
 class TileLocationCheckDisallowAboveSnowline(TileLocationCheck):
     """ Prevent building above snowline """
 
+    __slots__ = ("minh", "maxh", "outrange")
+
     def __init__(self):
         self.switch_result = None  # no default value for this check, it may not be the last check in a chain
         self.switch_entry_point = None
@@ -301,6 +468,8 @@ class TileLocationCheckDisallowAboveSnowline(TileLocationCheck):
 class TileLocationCheckDisallowBelowSnowline(TileLocationCheck):
     """ Prevent building above snowline """
 
+    __slots__ = ("minh", "maxh", "outrange")
+
     def __init__(self):
         self.switch_result = None  # no default value for this check, it may not be the last check in a chain
         self.switch_entry_point = None
@@ -316,6 +485,8 @@ class TileLocationCheckFounder(TileLocationCheck):
     Some tile checks relating to landscape are essential and are placed before player check
     """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = None
@@ -325,6 +496,18 @@ class TileLocationCheckFounder(TileLocationCheck):
 class Sprite(object):
     """Base class to hold simple sprites (using numbers from a base set)"""
 
+    __slots__ = (
+        "sprite_number",
+        "sprite_number_snow",
+        "xoffset",
+        "yoffset",
+        "zoffset",
+        "xextent",
+        "yextent",
+        "zextent",
+        "always_draw",
+    )
+
     def __init__(
         self,
         sprite_number,
@@ -359,6 +542,17 @@ class Sprite(object):
 class SmokeSprite(object):
     """ Base class to handle smoke sprites (using smoke sprite numbers from a base set) """
 
+    __slots__ = (
+        "sprite_number",
+        "xoffset",
+        "yoffset",
+        "zoffset",
+        "xextent",
+        "yextent",
+        "zextent",
+        "hide_sprite",
+    )
+
     def __init__(
         self,
         smoke_type,
@@ -401,6 +595,22 @@ class SmokeSprite(object):
 class Spriteset(object):
     """ Base class to hold industry spritesets """
 
+    __slots__ = (
+        "id",
+        "sprites",
+        "type",
+        "animation_rate",
+        "custom_sprite_selector",
+        "num_sprites_to_autofill",
+        "xoffset",
+        "yoffset",
+        "zoffset",
+        "xextent",
+        "yextent",
+        "zextent",
+        "always_draw",
+    )
+
     # !! arguably this should be two different classes, one for building/feature spritesets, and one for ground spritesets
     def __init__(
         self,
@@ -450,6 +660,17 @@ class Spriteset(object):
 class SpriteLayout(object):
     """ Base class to hold spritelayouts for industry spritelayouts """
 
+    __slots__ = (
+        "id",
+        "ground_sprite",
+        "ground_overlay",
+        "building_sprites",
+        "smoke_sprites",
+        "fences",
+        "magic_trees",
+        "terrain_aware_ground",
+    )
+
     def __init__(
         self,
         id,
@@ -787,6 +1008,8 @@ class MagicSpritelayoutSlopeAwareTrees(object):
 class MagicTree(object):
     """ Stubby class used in MagicSpriteLayoutSlopeAwareTrees; I just prefer object attribute access over an equivalent dict - Andy"""
 
+    __slots__ = ("default", "snow", "tropic", "xoffset", "yoffset")
+
     def __init__(self, trees, offsets, tree_num):
         self.default = trees["default"][tree_num]
         self.snow = trees["snow"][tree_num]
@@ -866,6 +1089,8 @@ class MagicSpritelayoutHarbourCoastFoundations(object):
 class GraphicsSwitch(object):
     """ base class for extra graphics switches """
 
+    __slots__ = ("id",)
+
     def __init__(self, id, **kwargs):
         self.id = id
 
@@ -873,6 +1098,8 @@ class GraphicsSwitch(object):
 class GraphicsSwitchSlopes(GraphicsSwitch):
     """ Class from which a slope-checking graphics switch can be generated, routing to appropriate spritelayout per slope type """
 
+    __slots__ = ("slope_spritelayout_mapping", "default_result")
+
     def __init__(self, id, slope_spritelayout_mapping, default_result):
         super().__init__(id)
         self.slope_spritelayout_mapping = slope_spritelayout_mapping
@@ -882,6 +1109,8 @@ class GraphicsSwitchSlopes(GraphicsSwitch):
 class IndustryLayout(object):
     """ Base class to hold industry layouts """
 
+    __slots__ = ("id", "layout")
+
     def __init__(self, id, layout):
         self.id = id
         self.layout = layout  # a list of 4-tuples (SE offset from N tile, SW offset from N tile, tile identifier, identifier of spriteset or next nml switch)
@@ -890,6 +1119,17 @@ class IndustryLayout(object):
 class IndustryLocationChecks(object):
     """ Class to hold location checks for an industry """
 
+    __slots__ = (
+        "industry",
+        "prevent_player_founding",
+        "same_type_distance",
+        "industry_max_distance",
+        "cluster",
+        "town_industry_count",
+        "coast_distance",
+        "flour_mill_layouts_by_date",
+    )
+
     def __init__(self, industry, location_args={}):
         self.industry = industry
         self.prevent_player_founding = location_args.get(
@@ -952,11 +1192,17 @@ class IndustryLocationChecks(object):
             result.appendleft(IndustryLocationCheckGrainMillLayoutsByDate())
 
         # prevent locating very near industries in the same accept / produce chain
-        for industry in set(incompatible_industries[self.industry]):
+        # sorted so that nml output is stable across runs (set order depends on object addresses, which differ per process)
+        for industry in sorted(
+            incompatible_industries[self.industry],
+            key=lambda industry: industry.numeric_id,
+        ):
             # don't check for self type, we have other ways to do that (occasionally economy cargo variations trigger this)
             if industry.id != self.industry.id:
                 result.append(IndustryLocationCheckIndustryMinDistance(industry.id, 16))
 
+        result = self.optimise_render_tree(result)
+
         prev = None
         for lc in reversed(result):
             lc.switch_entry_point = switch_prefix + lc.switch_entry_point
@@ -966,10 +1212,54 @@ class IndustryLocationChecks(object):
         result[0].switch_entry_point = switch_prefix + "check_location"
         return list(reversed(result))
 
+    def optimise_render_tree(self, location_checks):
+        # each check is a separate switch, which OpenTTD evaluates for every attempt to place the industry
+        # all checks after the founder check must pass, so the order of min distance checks doesn't matter, and they can be combined
+        # 1. drop min distance checks on a type that has another min distance check with a greater (or the same) distance
+        strongest_min_distance_checks = {}
+        for lc in location_checks:
+            if isinstance(lc, IndustryLocationCheckIndustryMinDistance):
+                strongest = strongest_min_distance_checks.get(lc.industry_type, None)
+                if strongest is None or lc.distance > strongest.distance:
+                    strongest_min_distance_checks[lc.industry_type] = lc
+        location_checks = [
+            lc
+            for lc in location_checks
+            if not isinstance(lc, IndustryLocationCheckIndustryMinDistance)
+            or strongest_min_distance_checks[lc.industry_type] is lc
+        ]
+        # 2. combine consecutive min distance checks with the same distance into one switch
+        result = deque([])
+        for lc in location_checks:
+            prev = result[-1] if len(result) > 0 else None
+            if (
+                isinstance(lc, IndustryLocationCheckIndustryMinDistance)
+                and isinstance(
+                    prev,
+                    (
+                        IndustryLocationCheckIndustryMinDistance,
+                        IndustryLocationCheckIndustriesMinDistance,
+                    ),
+                )
+                and prev.distance == lc.distance
+            ):
+                if isinstance(prev, IndustryLocationCheckIndustryMinDistance):
+                    prev = IndustryLocationCheckIndustriesMinDistance(
+                        [prev.industry_type], prev.distance
+                    )
+                    result[-1] = prev
+                prev.add_industry_type(lc.industry_type)
+            else:
+                result.append(lc)
+        return result
+
 
 class IndustryLocationCheck(object):
     """ sparse base class for industry location checks """
 
+    # subclasses must also declare __slots__ (even if empty), or instances get a __dict__ anyway
+    __slots__ = ("switch_result", "switch_entry_point", "macro_name")
+
     @property
     def macro(self):
         return templates["location_check_macros_industry.pynml"].macros[self.macro_name]
@@ -978,11 +1268,14 @@ class IndustryLocationCheck(object):
 class IndustryLocationCheckTownIndustryCount(IndustryLocationCheck):
     """ Require specific count of industry type in a town """
 
+    __slots__ = ("industry_type_numeric_id", "min_count", "max_count")
+
     def __init__(self, town_industry_count):
         # use the numeric_id so that we can do single-industry compiles without nml barfing on missing identifiers
-        self.industry_type_numeric_id = get_another_industry(
+        # numeric ids come from global_constants, so the other industry doesn't need to be registered
+        self.industry_type_numeric_id = global_constants.industry_numeric_ids[
             town_industry_count[0]
-        ).numeric_id
+        ]
         self.min_count = town_industry_count[1]
         self.max_count = town_industry_count[2]
         if self.min_count != 0 or self.max_count != 0:
@@ -997,6 +1290,8 @@ class IndustryLocationCheckTownIndustryCount(IndustryLocationCheck):
 class IndustryLocationCheckCluster(IndustryLocationCheck):
     """ Require industries to locate in n clusters """
 
+    __slots__ = ("industry_type_numeric_id", "max_distance", "cluster_factor")
+
     def __init__(self, industry_type, cluster):
         # use the numeric_id so that we can do single-industry compiles without nml barfing on missing identifiers
         self.industry_type_numeric_id = industry_type
@@ -1011,25 +1306,66 @@ class IndustryLocationCheckCluster(IndustryLocationCheck):
 class IndustryLocationCheckIndustryMinDistance(IndustryLocationCheck):
     """ Prevent locating near incompatible industry types """
 
+    __slots__ = ("industry_type", "industry_type_numeric_id", "distance")
+
     def __init__(self, industry_type, distance):
         self.industry_type = industry_type
         # use the numeric_id so that we can do single-industry compiles without nml barfing on missing identifiers
-        self.industry_type_numeric_id = get_another_industry(industry_type).numeric_id
+        # numeric ids come from global_constants, so the other industry doesn't need to be registered
+        self.industry_type_numeric_id = global_constants.industry_numeric_ids[
+            industry_type
+        ]
         self.distance = distance
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = "min_distance_" + str(self.industry_type_numeric_id)
         self.macro_name = "check_industry_min_distance"
 
 
+class IndustryLocationCheckIndustriesMinDistance(IndustryLocationCheck):
+    """ Prevent locating near any of several industry types, with the same distance for all, in one switch """
+
+    __slots__ = ("industry_types", "industry_type_numeric_ids", "distance")
+
+    def __init__(self, industry_types, distance):
+        self.industry_types = []
+        self.industry_type_numeric_ids = []
+        self.distance = distance
+        for industry_type in industry_types:
+            self.add_industry_type(industry_type)
+        self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
+        # the first type is enough for a unique switch name, as each type is only checked once per industry
+        self.switch_entry_point = "min_distance_" + str(
+            self.industry_type_numeric_ids[0]
+        )
+        self.macro_name = "check_industries_min_distance"
+
+    def add_industry_type(self, industry_type):
+        # use the numeric_id so that we can do single-industry compiles without nml barfing on missing identifiers
+        self.industry_types.append(industry_type)
+        self.industry_type_numeric_ids.append(
+            global_constants.industry_numeric_ids[industry_type]
+        )
+
+    @property
+    def expression(self):
+        return " || ".join(
+            "industry_distance(" + str(numeric_id) + ") <= " + str(self.distance)
+            for numeric_id in self.industry_type_numeric_ids
+        )
+
+
 class IndustryLocationCheckIndustryMaxDistance(IndustryLocationCheck):
     """ Prevent locating near incompatible industry types """
 
+    __slots__ = ("industry_type", "industry_type_numeric_id", "distance")
+
     def __init__(self, industry_max_distance):
         self.industry_type = industry_max_distance[0]
         # use the numeric_id so that we can do single-industry compiles without nml barfing on missing identifiers
-        self.industry_type_numeric_id = get_another_industry(
+        # numeric ids come from global_constants, so the other industry doesn't need to be registered
+        self.industry_type_numeric_id = global_constants.industry_numeric_ids[
             self.industry_type
-        ).numeric_id
+        ]
         self.distance = industry_max_distance[1]
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = "max_distance_" + str(self.industry_type_numeric_id)
@@ -1039,6 +1375,8 @@ class IndustryLocationCheckIndustryMaxDistance(IndustryLocationCheck):
 class IndustryLocationCheckFounder(IndustryLocationCheck):
     """ Ensures player can build irrespective of _industry_ location checks (tile checks still apply) """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = "check_founder"
@@ -1048,6 +1386,8 @@ class IndustryLocationCheckFounder(IndustryLocationCheck):
 class IndustryLocationCheckCoastDistance(IndustryLocationCheck):
     """ Maximum distance to coast (player can vary this with parameter) """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = "coast_distance"
@@ -1057,6 +1397,8 @@ class IndustryLocationCheckCoastDistance(IndustryLocationCheck):
 class IndustryLocationCheckGrainMillLayoutsByDate(IndustryLocationCheck):
     """ Custom check for Grain mill, layouts are restricted by date; this is a one-off, but could be made generic if needed """
 
+    __slots__ = ()
+
     def __init__(self):
         self.switch_result = "return CB_RESULT_LOCATION_ALLOW"  # default result, value may also be id for next switch
         self.switch_entry_point = "check_date"
@@ -1151,6 +1493,9 @@ class Industry(object):
         self.spritelayouts = []  # by convention spritelayout is one word :P
         self.extra_graphics_switches = []
         self.industry_layouts = []
+        # names of spritesets (without _snow suffix) whose snow graphics are the same as the default graphics
+        # set by render_nml (see snow_graphics), until then all snow spritesets are used
+        self.identical_snow_spritesets = set()
         self.default_industry_properties = IndustryProperties(**kwargs)
         self.economy_variations = {}
         for economy in registered_economies:
@@ -1161,6 +1506,8 @@ class Industry(object):
         self.location_checks = IndustryLocationChecks(
             self, kwargs.get("location_checks", {})
         )
+        # economy id (or None for the defaults) -> {property name: value}, frozen when the industry is registered
+        self.resolved_properties = None
 
     def register(self):
         if (
@@ -1174,6 +1521,8 @@ class Industry(object):
             == 0
         ):
             utils.echo_message(self.id + " is not used in any economy")
+        # industry properties are all set by the time the industry is registered, so resolve them once here
+        self.resolve_properties()
         registered_industries.append(self)
 
     def add_tile(self, *args, **kwargs):
@@ -1231,23 +1580,32 @@ class Industry(object):
         self, date_variation_num=None, terrain="", construction_state_num=None
     ):
         # don't use os.path.join here, this returns a string for use by nml
+        # nml uses the spritesheets processed by render_graphics, not the ones in src/graphics
         if construction_state_num != None:
-            return (
-                '"src/graphics/industries/'
-                + self.id
-                + "_construction_"
-                + str(construction_state_num + 1)
-                + '.png"'
+            file_name = (
+                self.id + "_construction_" + str(construction_state_num + 1) + ".png"
             )
         else:
-            return (
-                '"src/graphics/industries/'
-                + self.id
-                + "_"
-                + str(date_variation_num + 1)
-                + terrain
-                + '.png"'
-            )
+            file_name = self.id + "_" + str(date_variation_num + 1) + terrain + ".png"
+        return '"' + global_constants.graphics_path + "industries/" + file_name + '"'
+
+    def get_graphics_file_names(self):
+        # names of all the spritesheets that get_graphics_file_path() can refer to
+        result = []
+        for date_variation_num in range(len(self.graphics_change_dates) + 1):
+            for terrain in ["", "_snow"]:
+                result.append(
+                    self.id + "_" + str(date_variation_num + 1) + terrain + ".png"
+                )
+        if self.default_industry_properties.override_default_construction_states:
+            for construction_state_num in range(3):
+                result.append(
+                    self.id
+                    + "_construction_"
+                    + str(construction_state_num + 1)
+                    + ".png"
+                )
+        return result
 
     def get_switch_name_for_construction_states(self):
         # industries use the default construction sprites (shared), or their own handled by automagic spritesets / spritelayouts (graphics in spritesheets with same layout as industry)
@@ -1294,6 +1652,30 @@ class Industry(object):
                 + str(self.graphics_change_dates[date_variation_index])
             )
 
+    def get_houses_nearby_tile_reads(self):
+        # worst case (no houses found) count of nearby tiles read by require_houses_nearby checks, to place the industry once
+        tile_reads = {}
+        for tile in self.tiles:
+            if (
+                tile.location_checks is not None
+                and tile.location_checks.require_houses_nearby
+            ):
+                tile_reads[tile.id] = len(
+                    get_houses_nearby_search_points(
+                        tile.location_checks.houses_nearby_search, self.id
+                    )
+                )
+        result = 0
+        for industry_layout in self.industry_layouts:
+            result = max(
+                result,
+                sum(
+                    tile_reads.get(layout_tile[2], 0)
+                    for layout_tile in industry_layout.layout
+                ),
+            )
+        return result
+
     def get_industry_layouts_as_property(self):
         result = [
             industry_layout.id + "_tilelayout"
@@ -1371,11 +1753,33 @@ class Industry(object):
         else:
             return result
 
+    def resolve_properties(self):
+        # flattens the economy variations over the defaults, so get_property() is a single dict lookup
+        default_properties = vars(self.default_industry_properties)
+        self.resolved_properties = {None: dict(default_properties)}
+        for economy_id, economy_variation in self.economy_variations.items():
+            resolved = dict(default_properties)
+            for property_name, economy_value in vars(economy_variation).items():
+                if economy_value is not None:
+                    resolved[property_name] = economy_value
+            self.resolved_properties[economy_id] = resolved
+        # map colour uses a guarding function, run once per distinct value rather than on every lookup
+        map_colours = set(
+            resolved["map_colour"] for resolved in self.resolved_properties.values()
+        )
+        for map_colour in sorted(map_colours - {None}):
+            self.validate_map_colour(map_colour)
+
     def get_property(self, property_name, economy):
         # does magic to get the property from the defaults if not set
         # that enables economies to over-ride selected properties and not bother setting others
         # doesn't try to handle failure case of property not found at all: don't look up props that don't exist
+        if self.resolved_properties is not None:
+            if economy is None:
+                return self.resolved_properties[None][property_name]
+            return self.resolved_properties[economy.id][property_name]
 
+        # before the industry is registered, the properties may still be changing, so look them up every time
         default_value = getattr(self.default_industry_properties, property_name)
         if economy is None:
             value = default_value
@@ -1487,6 +1891,27 @@ class Industry(object):
                 + " which is invalid (lacks contrast)"
             )
 
+    def get_ground_tile_spritesets(self):
+        # (ground tile type, number of frames) for each ground tile spriteset that unpack_sprite_or_spriteset() refers to
+        # matches the conditions in spritelayouts.pynml, so ground tile spritesets that aren't drawn aren't included
+        spritesets = []
+        for spritelayout in self.spritelayouts:
+            if not spritelayout.terrain_aware_ground:
+                spritesets.append(spritelayout.ground_sprite)
+            spritesets.append(spritelayout.ground_overlay)
+            spritesets.extend(spritelayout.building_sprites)
+        return set(
+            (spriteset.type, spriteset.num_sprites_to_autofill)
+            for spriteset in spritesets
+            if isinstance(spriteset, Spriteset) and spriteset.type not in ["", "empty"]
+        )
+
+    def snow_spriteset_is_identical(self, spriteset, date_variation_num):
+        return (
+            spriteset.id + "_" + str(date_variation_num)
+            in self.identical_snow_spritesets
+        )
+
     def unpack_sprite_or_spriteset(
         self,
         sprite_or_spriteset,
@@ -1504,6 +1929,11 @@ class Industry(object):
             suffix = ""
         if isinstance(sprite_or_spriteset, Spriteset):
             date_variation_suffix = "_" + str(date_variation_num)
+            # the default spriteset is used in place of a snow spriteset with the same graphics
+            if self.snow_spriteset_is_identical(
+                sprite_or_spriteset, date_variation_num
+            ):
+                suffix = ""
             # tiny optimisation, don't use an animation sprite selector if there is no animation
             if sprite_or_spriteset.animation_rate > 0:
                 if sprite_or_spriteset.custom_sprite_selector:
@@ -1555,11 +1985,12 @@ class Industry(object):
         if isinstance(sprite_or_spriteset, Sprite):
             return getattr(sprite_or_spriteset, "sprite_number" + suffix)
 
-    def render_nml(self, incompatible_industries):
+    def render_nml(self, incompatible_industries, nml_file):
         # incompatible industries isn't known at init time, only at compile time, so it has to be passed in
+        # the nml is unescaped on the way into nml_file (which is closed after writing)
         industry_template = templates[self.template]
-        templated_nml = utils.unescape_chameleon_output(
-            industry_template(
+        with profiling.span("template " + self.template):
+            templated_nml = industry_template(
                 industry=self,
                 global_constants=global_constants,
                 graphics_temp_storage=global_constants.graphics_temp_storage,  # convenience measure
@@ -1567,8 +1998,10 @@ class Industry(object):
                 economies=registered_economies,
                 utils=utils,
             )
-        )
-        return templated_nml
+        with profiling.span("unescape chameleon output and write nml"):
+            unescaped_nml_file = utils.UnescapedChameleonOutputWriter(nml_file)
+            unescaped_nml_file.write(templated_nml)
+            unescaped_nml_file.close()
 
 
 class IndustryPrimary(Industry):
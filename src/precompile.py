@@ -0,0 +1,33 @@
+print("[PRECOMPILE] precompile templates")
+
+import os
+
+currentdir = os.curdir
+from time import time
+
+import template_cache
+
+from chameleon import PageTemplateLoader  # chameleon used in most template cases
+
+# the template loader settings must match the render scripts, as chameleon includes them in the cache key
+template_dirs = [
+    (os.path.join(currentdir, "src", "templates"), ".pynml", {"format": "text"}),
+    (os.path.join(currentdir, "src", "docs_templates"), ".pt", {"format": "text"}),
+    (os.path.join(currentdir, "src", "lang_templates"), ".pylng", {}),
+]
+
+
+def main():
+    start = time()
+    for templates_path, extension, loader_config in template_dirs:
+        templates = PageTemplateLoader(templates_path, **loader_config)
+        for template_name in sorted(os.listdir(templates_path)):
+            if template_name.endswith(extension):
+                # templates pulled in with 'load:' are compiled the same as templates rendered directly, so this covers them too
+                templates[template_name].cook_check()
+    template_cache.report()
+    print(format((time() - start), ".2f") + "s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Optional build profiling, to find where build time goes.
+Enable with PROFILE=True, e.g. 'make nml PROFILE=True' (passed to the render scripts by the makefile).
+When enabled, each render script writes to generated/profile:
+- [script name].json, a trace in chrome trace event format (open with chrome://tracing or https://ui.perfetto.dev)
+  with wall time, cpu time and net allocated memory per span
+- [script name].folded, collapsed stacks (self time in microseconds) for flamegraph.pl, speedscope etc
+render_nml also reports the worst case number of tiles read by require_houses_nearby checks per placement, for each industry
+(without profiling, only the slowest industry is reported).
+When not enabled, spans cost one function call and a bool check.
+"""
+
+import os
+import sys
+import json
+import tracemalloc
+from contextlib import contextmanager
+from time import time, process_time
+
+import utils
+
+enabled = bool(utils.get_makefile_args(sys).get("profile", None))
+
+# completed spans, in order of completion
+spans = []
+# names of the currently open spans, outermost first
+stack = []
+
+
+@contextmanager
+def span(name):
+    if not enabled:
+        yield
+        return
+    stack.append(name)
+    start_wall = time()
+    start_cpu = process_time()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        spans.append(
+            {
+                "name": name,
+                "stack": ";".join(stack),
+                "pid": os.getpid(),
+                "start": start_wall,
+                "wall": time() - start_wall,
+                "cpu": process_time() - start_cpu,
+                "allocated": tracemalloc.get_traced_memory()[0] - start_memory,
+            }
+        )
+        stack.pop()
+
+
+def clear_spans():
+    # used as the initializer for forked workers, which otherwise inherit a copy of the spans (and open spans) from the parent
+    del spans[:]
+    del stack[:]
+
+
+def pop_spans():
+    # used to send spans recorded in a forked worker back to the parent process
+    result = spans[:]
+    clear_spans()
+    return result
+
+
+def add_spans(new_spans):
+    # spans from forked workers are nested under whichever span the parent has open when it receives them
+    for span_record in new_spans:
+        spans.append(dict(span_record, stack=";".join(stack + [span_record["stack"]])))
+
+
+def instrument_chameleon():
+    # wraps chameleon macro calls (both 'load: foo.pynml' and foo.macros['bar']) so each macro gets a span
+    # only done when profiling, the wrappers aren't free
+    from chameleon.zpt import template as zpt_template
+
+    page_template_include = zpt_template.PageTemplate.include
+
+    def include(self, *args, **kwargs):
+        with span("macro " + os.path.basename(str(self.filename))):
+            page_template_include(self, *args, **kwargs)
+
+    zpt_template.PageTemplate.include = include
+
+    macros_getitem = zpt_template.Macros.__getitem__
+
+    def getitem(self, name):
+        macro_include = macros_getitem(self, name).include
+        span_name = (
+            "macro " + os.path.basename(str(self.template.filename)) + ":" + name
+        )
+
+        def include(*args, **kwargs):
+            with span(span_name):
+                macro_include(*args, **kwargs)
+
+        return zpt_template.Macro(include)
+
+    zpt_template.Macros.__getitem__ = getitem
+
+
+def write_profile(script_name):
+    if not enabled:
+        return
+    profile_path = os.path.join(utils.get_generated_files_path(), "profile")
+    if not os.path.exists(profile_path):
+        os.mkdir(profile_path)
+
+    trace_events = [
+        {
+            "name": span_record["name"],
+            "cat": span_record["stack"],
+            "ph": "X",
+            "pid": span_record["pid"],
+            "tid": span_record["pid"],
+            "ts": int(span_record["start"] * 1000000),
+            "dur": int(span_record["wall"] * 1000000),
+            "args": {
+                "wall_s": round(span_record["wall"], 6),
+                "cpu_s": round(span_record["cpu"], 6),
+                "allocated_bytes": span_record["allocated"],
+            },
+        }
+        for span_record in spans
+    ]
+    with open(
+        os.path.join(profile_path, script_name + ".json"), "w", encoding="utf8"
+    ) as trace_file:
+        json.dump({"traceEvents": trace_events}, trace_file, indent=1)
+
+    # collapsed stacks want self time, so subtract time spent in direct children
+    self_times = {}
+    for span_record in spans:
+        self_times.setdefault(span_record["stack"], 0)
+        self_times[span_record["stack"]] += span_record["wall"]
+        parent_stack = span_record["stack"].rpartition(";")[0]
+        if parent_stack != "":
+            self_times.setdefault(parent_stack, 0)
+            self_times[parent_stack] -= span_record["wall"]
+    with open(
+        os.path.join(profile_path, script_name + ".folded"), "w", encoding="utf8"
+    ) as folded_file:
+        for span_stack, self_time in sorted(self_times.items()):
+            # parallel workers can make children sum to more than the parent's wall time, clamp those
+            folded_file.write(
+                span_stack + " " + str(max(int(self_time * 1000000), 0)) + "\n"
+            )
+    print("[PROFILE] written to " + profile_path)
+
+
+if enabled:
+    # chameleon reads the cache location when it's imported, so make sure that's set up before instrumenting
+    utils.setup_chameleon_cache()
+    instrument_chameleon()
+    tracemalloc.start()
@@ -0,0 +1,50 @@
+"""
+  This file is part of FIRS Industry Set for OpenTTD.
+  FIRS is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+  FIRS is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+  See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with FIRS. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+class Registry(list):
+    """
+    Registered objects (industries, cargos, economies) in registration order, as a list.
+    Also indexed by attributes, so objects can be found without scanning the list, e.g. registered_cargos.get("cargo_label", "COAL").
+    Registries are only changed by register() (and by watch mode reloading modules), so only those list methods maintain the indexes.
+    """
+
+    def __init__(self, **index_keys):
+        # index_keys map an index name to a function that gets the index key from an object
+        super().__init__()
+        self.index_keys = index_keys
+        self.indexes = {index_name: {} for index_name in index_keys}
+
+    def add_to_indexes(self, item):
+        # if objects share a key, the first registered is found, same as scanning the list
+        for index_name, index_key in self.index_keys.items():
+            self.indexes[index_name].setdefault(index_key(item), item)
+
+    def rebuild_indexes(self):
+        for index in self.indexes.values():
+            index.clear()
+        for item in self:
+            self.add_to_indexes(item)
+
+    def get(self, index_name, key, default=None):
+        return self.indexes[index_name].get(key, default)
+
+    def append(self, item):
+        super().append(item)
+        self.add_to_indexes(item)
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self.rebuild_indexes()
+
+    def remove(self, item):
+        super().remove(item)
+        self.rebuild_indexes()
+
+    def clear(self):
+        super().clear()
+        self.rebuild_indexes()
@@ -15,7 +15,11 @@ from PIL import Image
 import utils as utils
 import global_constants as global_constants
 from polar_fox import git_info
-import firs
+import profiling
+
+with profiling.span("import firs"):
+    import firs
+import template_cache
 from incompatible_grfs import incompatible_grfs
 
 docs_src = os.path.join(currentdir, "src", "docs_templates")
@@ -48,14 +52,9 @@ base_lang_strings = utils.parse_base_lang()
 metadata = {}
 metadata.update(global_constants.metadata)
 
-# default sort for docs is by id
-registered_cargos = sorted(
-    firs.registered_cargos, key=lambda registered_cargos: registered_cargos.id
-)
-registered_industries = sorted(
-    firs.registered_industries,
-    key=lambda registered_industries: registered_industries.id,
-)
+# default sort for docs is by id, the sorted lists are filled by main()
+registered_cargos = []
+registered_industries = []
 registered_economies = firs.registered_economies
 economy_schemas = {}
 palette = utils.dos_palette_to_rgb()
@@ -181,22 +180,18 @@ class DocHelper(object):
     def industries_producing_cargo(self, cargo, economy):
         result = set()
         if cargo in economy_schemas[economy]["enabled_cargos"]:
-            for industry in economy_schemas[economy]["enabled_industries"]:
-                cargo_list = industry.get_prod_cargo_types(economy)
-                for cargo_label, output_ratio in cargo_list:
-                    if cargo.cargo_label == cargo_label:
-                        result.add(industry)
+            result = economy_schemas[economy]["industries_producing_cargo"].get(
+                cargo.cargo_label, result
+            )
         result = sorted(result, key=self.get_industry_name)
         return result
 
     def industries_accepting_cargo(self, cargo, economy):
         result = set()
         if cargo in economy_schemas[economy]["enabled_cargos"]:
-            for industry in economy_schemas[economy]["enabled_industries"]:
-                cargo_list = industry.get_accept_cargo_types(economy)
-                for cargo_label in cargo_list:
-                    if cargo.cargo_label == cargo_label:
-                        result.add(industry)
+            result = economy_schemas[economy]["industries_accepting_cargo"].get(
+                cargo.cargo_label, result
+            )
         result = sorted(result, key=self.get_industry_name)
         return result
 
@@ -222,9 +217,9 @@ class DocHelper(object):
     def get_cargo_objects_from_labels(self, cargo_list):
         result = []
         for cargo_label in cargo_list:
-            for cargo in registered_cargos:
-                if cargo_label == cargo.cargo_label:
-                    result.append(cargo)
+            cargo = firs.registered_cargos.get("cargo_label", cargo_label)
+            if cargo is not None:
+                result.append(cargo)
         return result
 
     def filter_cargos_by_active_in_economy(self, cargo_list, economy):
@@ -314,6 +309,14 @@ def render_docs(doc_list, file_type, use_markdown=False):
 
 def main():
     start = time()
+    # sorted in place on every run, so that docs pick up industries and cargos reloaded by watch mode
+    registered_cargos[:] = sorted(
+        firs.registered_cargos, key=lambda registered_cargos: registered_cargos.id
+    )
+    registered_industries[:] = sorted(
+        firs.registered_industries,
+        key=lambda registered_industries: registered_industries.id,
+    )
     for economy in registered_economies:
         enabled_cargos = [
             cargo for cargo in registered_cargos if cargo.id in economy.cargo_ids
@@ -323,9 +326,30 @@ def main():
             for industry in registered_industries
             if industry.economy_variations[economy.id].enabled
         ]
+        # indexed by cargo label once per economy, from the incidence matrix firs.py built for the economy
+        incidence_matrix = firs.economy_incidence_matrices[economy]
+        enabled_rows = 0
+        for row, industry in enumerate(incidence_matrix.industries):
+            if industry.economy_variations[economy.id].enabled:
+                enabled_rows |= 1 << row
+        industries_producing_cargo = {}
+        industries_accepting_cargo = {}
+        for cargo_label in incidence_matrix.cargo_labels:
+            industries_producing_cargo[cargo_label] = set(
+                incidence_matrix.get_industries(
+                    incidence_matrix.produce[cargo_label] & enabled_rows
+                )
+            )
+            industries_accepting_cargo[cargo_label] = set(
+                incidence_matrix.get_industries(
+                    incidence_matrix.accept[cargo_label] & enabled_rows
+                )
+            )
         economy_schemas[economy] = {
             "enabled_cargos": enabled_cargos,
             "enabled_industries": enabled_industries,
+            "industries_producing_cargo": industries_producing_cargo,
+            "industries_accepting_cargo": industries_accepting_cargo,
         }
 
     # copy the cargo icons to an oversized image so they're legible
@@ -354,24 +378,56 @@ def main():
     graph_docs = ["cargoflow"]
     stylesheets = ["cargoflow_styles"]
 
-    render_docs(html_docs, "html")
-    render_docs(txt_docs, "txt")
+    with profiling.span("html docs"):
+        render_docs(html_docs, "html")
+    with profiling.span("txt docs"):
+        render_docs(txt_docs, "txt")
     # just render the markdown docs twice to get txt and html versions, simples no?
-    render_docs(markdown_docs, "txt")
-    render_docs(markdown_docs, "html", use_markdown=True)
-    render_docs(graph_docs, "dotall")
-    render_docs(stylesheets, "css")
+    with profiling.span("markdown docs"):
+        render_docs(markdown_docs, "txt")
+        render_docs(markdown_docs, "html", use_markdown=True)
+    with profiling.span("graph docs"):
+        render_docs(graph_docs, "dotall")
+    with profiling.span("stylesheets"):
+        render_docs(stylesheets, "css")
 
     # cargoflow wrappers are just different enough to not fit generic render_docs() case without making it painfully convoluted
     for economy in registered_economies:
-        template = docs_templates["cargoflow_wrapper.pt"]
-        result = template(economy=economy, doc_helper=DocHelper())
         doc_name = "cargoflow_" + DocHelper().get_economy_name_char_safe(economy)
-        doc_file = codecs.open(
-            os.path.join(docs_output_path, "html", doc_name + ".html"), "w", "utf8"
-        )
-        doc_file.write(result)
-        doc_file.close()
+        with profiling.span("doc " + doc_name):
+            template = docs_templates["cargoflow_wrapper.pt"]
+            result = template(economy=economy, doc_helper=DocHelper())
+            doc_file = codecs.open(
+                os.path.join(docs_output_path, "html", doc_name + ".html"),
+                "w",
+                "utf8",
+            )
+            doc_file.write(result)
+            doc_file.close()
+
+    used_templates = []
+    for doc_name in html_docs + txt_docs + markdown_docs + graph_docs + stylesheets:
+        utils.get_template_dependencies(docs_src, doc_name + ".pt", used_templates)
+    for template_name in ["markdown_wrapper.pt", "cargoflow_wrapper.pt"]:
+        utils.get_template_dependencies(docs_src, template_name, used_templates)
+    static_files = []
+    for dirpath, dirnames, filenames in os.walk(static_dir_src):
+        static_files.extend(os.path.join(dirpath, filename) for filename in filenames)
+    utils.write_makefile_dependencies(
+        docs_output_path,
+        os.path.join(firs.generated_files_path, "docs.d"),
+        utils.get_src_module_paths()
+        + [os.path.join(docs_src, template_name) for template_name in used_templates]
+        + static_files
+        + [
+            os.path.join(docs_src, "index.html"),
+            os.path.join(docs_src, "extra_strings.lng"),
+            os.path.join(currentdir, "src", "lang", "english.lng"),
+            cargo_icons_src,
+        ],
+    )
+    profiling.write_profile("render_docs")
+    template_cache.report()
     # eh, how long does this take anyway?
     print(format((time() - start), ".2f") + "s")
 
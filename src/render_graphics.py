@@ -1,5 +1,220 @@
 """
-FIRS does not currently generate graphics files
-However it's easier to maintain commonality in the makefile if this is in place as a stub
+Runs the polar_fox graphics processing units over each industry spritesheet, and writes the results to generated/graphics.
+nml uses the spritesheets in generated/graphics, so this is the place for crop, recolour and composite steps.
+Spritesheets are only processed again if the source image or the processing units have changed since the last build.
 """
-print("[RENDER GRAPHICS] (not currently used)")
+print("[RENDER GRAPHICS] render_graphics.py")
+
+import sys
+import os
+import multiprocessing
+import hashlib
+import json
+
+currentdir = os.curdir
+from time import time
+
+import utils
+import profiling
+
+# get args passed by makefile
+makefile_args = utils.get_makefile_args(sys)
+
+# with a test industry, only the test industry's spritesheets are processed
+if makefile_args.get("test_industry", None):
+    os.environ["FIRS_TEST_INDUSTRY_CLOSURE"] = makefile_args["test_industry"]
+
+with profiling.span("import firs"):
+    import firs
+import global_constants
+import validate_sprites
+from polar_fox import graphics_units
+from polar_fox import pixa
+import graphics_processing.graphics_units
+
+from PIL import Image
+
+src_graphics_path = os.path.join(currentdir, "src", "graphics", "industries")
+graphics_output_path = os.path.join(global_constants.graphics_path, "industries")
+# records a hash of the inputs each spritesheet was processed from, so unchanged spritesheets can be reused
+graphics_manifest_path = os.path.join(global_constants.graphics_path, "manifest.json")
+
+
+def industry_is_built(industry):
+    # when a test industry is set, all other industries are left out of firs.nml, so their spritesheets aren't needed
+    only_build_test_industry = makefile_args.get("test_industry", None)
+    return not only_build_test_industry or only_build_test_industry == industry.id
+
+
+def get_units(industry, file_name):
+    # the processing units for a spritesheet, applied in order
+    # currently the spritesheets are used as they are, add units here to process them
+    # consecutive recolour units are fused, so they make one pass over the spritesheet
+    return graphics_processing.graphics_units.fuse_recolour_units(
+        [graphics_units.PassThrough()]
+    )
+
+
+def get_units_fingerprint(units):
+    # units are plain objects, their class and attributes identify what they do
+    return repr(
+        [
+            (unit.__class__.__name__, sorted(vars(unit).items(), key=lambda x: x[0]))
+            for unit in units
+        ]
+    )
+
+
+def load_graphics_manifest():
+    if not os.path.exists(graphics_manifest_path):
+        return {}
+    with open(graphics_manifest_path, "r", encoding="utf8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_graphics_manifest(manifest):
+    with open(graphics_manifest_path, "w", encoding="utf8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4, sort_keys=True)
+
+
+def get_processing_code_paths():
+    # polar_fox graphics_units and pixa, and the FIRS versions that wrap them
+    return utils.get_src_file_paths(
+        [
+            "render_graphics.py",
+            os.path.join("polar_fox", "graphics_units.py"),
+            os.path.join("polar_fox", "pixa.py"),
+            "graphics_processing",
+        ]
+    )
+
+
+def get_spritesheet_prerequisites():
+    # the spritesheets of every registered industry (all of them, as test industry builds don't write graphics.d)
+    # spritesheets that don't exist (yet) can't be prerequisites, so the src dir is too, which changes when spritesheets are added
+    # the output dir changes when outputs are removed, so those are processed again
+    result = [src_graphics_path, graphics_output_path]
+    for industry in firs.registered_industries:
+        for file_name in industry.get_graphics_file_names():
+            input_path = os.path.join(src_graphics_path, file_name)
+            if os.path.exists(input_path):
+                result.append(input_path)
+    return result
+
+
+def get_spritesheet_hash(input_path, units, code_hash):
+    spritesheet_hash = hashlib.md5(code_hash.encode("utf8"))
+    utils.update_hash_from_files(spritesheet_hash, [input_path])
+    spritesheet_hash.update(get_units_fingerprint(units).encode("utf8"))
+    return spritesheet_hash.hexdigest()
+
+
+def render_spritesheet(job):
+    input_path, output_path, units = job
+    input_image = Image.open(input_path)
+    # nml uses the palette indexes of 8bpp images, so the source palette is kept (not all spritesheets use the same palette)
+    spritesheet = pixa.make_spritesheet_from_image(
+        input_image, input_image.getpalette()
+    )
+    for unit in units:
+        spritesheet = unit.render(spritesheet)
+    spritesheet.save(output_path)
+    return output_path
+
+
+def main():
+    start = time()
+    if not os.path.exists(graphics_output_path):
+        os.makedirs(graphics_output_path)
+
+    # nmlc only finds mistakes in spritesets when it compiles the grf, this finds them first
+    with profiling.span("validate sprites"):
+        validate_sprites.validate_industry_spritesheets(
+            [
+                industry
+                for industry in firs.registered_industries
+                if industry_is_built(industry)
+            ],
+            use_multiprocessing=not makefile_args.get("no_mp", None),
+        )
+
+    manifest = load_graphics_manifest()
+    # changes to the processing code invalidate every spritesheet
+    code_hash = hashlib.md5()
+    utils.update_hash_from_files(code_hash, get_processing_code_paths())
+    code_hash = code_hash.hexdigest()
+
+    spritesheet_hashes = {}
+    stale_jobs = []
+    with profiling.span("hash spritesheet inputs"):
+        for industry in firs.registered_industries:
+            if not industry_is_built(industry):
+                continue
+            for file_name in industry.get_graphics_file_names():
+                input_path = os.path.join(src_graphics_path, file_name)
+                # not every industry has every spritesheet, validate_sprites reports any that are used but missing
+                if not os.path.exists(input_path):
+                    continue
+                output_path = os.path.join(graphics_output_path, file_name)
+                units = get_units(industry, file_name)
+                spritesheet_hashes[file_name] = get_spritesheet_hash(
+                    input_path, units, code_hash
+                )
+                if not os.path.exists(output_path) or (
+                    manifest.get(file_name) != spritesheet_hashes[file_name]
+                ):
+                    stale_jobs.append((input_path, output_path, units))
+
+    # the workers only need polar_fox and PIL, which are already imported, so fork them
+    if makefile_args.get("no_mp", None) or len(stale_jobs) < 2:
+        pool = None
+        rendered_spritesheets = map(render_spritesheet, stale_jobs)
+    else:
+        pool = multiprocessing.get_context("fork").Pool(
+            processes=multiprocessing.cpu_count()
+        )
+        rendered_spritesheets = pool.imap_unordered(render_spritesheet, stale_jobs)
+    with profiling.span("spritesheets"):
+        for output_path in rendered_spritesheets:
+            pass
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(
+        "[RENDER GRAPHICS] processed "
+        + str(len(stale_jobs))
+        + " of "
+        + str(len(spritesheet_hashes))
+        + " spritesheets"
+    )
+    if makefile_args.get("test_industry", None):
+        # the spritesheets of other industries weren't touched, so keep their hashes
+        spritesheet_hashes = dict(manifest, **spritesheet_hashes)
+    else:
+        # remove spritesheets that nml no longer uses (e.g. an industry was removed)
+        for file_name in os.listdir(graphics_output_path):
+            if file_name not in spritesheet_hashes:
+                os.remove(os.path.join(graphics_output_path, file_name))
+    save_graphics_manifest(spritesheet_hashes)
+
+    # make compares the mtime of the graphics dir to its prerequisites
+    os.utime(global_constants.graphics_path)
+    dependency_file_path = os.path.join(firs.generated_files_path, "graphics.d")
+    if makefile_args.get("test_industry", None):
+        # only the test industry closure was registered, so the spritesheets of other industries would be missing
+        utils.remove_makefile_dependencies(dependency_file_path)
+    else:
+        utils.write_makefile_dependencies(
+            global_constants.graphics_path,
+            dependency_file_path,
+            utils.get_src_module_paths()
+            + get_processing_code_paths()
+            + get_spritesheet_prerequisites(),
+        )
+    profiling.write_profile("render_graphics")
+    print(format((time() - start), ".2f") + "s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import firs
 import utils
 from polar_fox import git_info
 
@@ -14,48 +13,71 @@ sys.path.append(os.path.join("src"))  # add to the module search path
 
 import codecs  # used for writing files - more unicode friendly than standard open() module
 
+# lang doesn't need the industry and cargo registry, so firs isn't imported (that would make lang depend on every industry module)
+import template_cache
+
+generated_files_path = utils.get_generated_files_path()
+
+# imported before chameleon, as profiling instruments chameleon's macro calls
+import profiling
+
 from chameleon import PageTemplateLoader  # chameleon used in most template cases
 
 # setup the places we look for templates
-lang_templates = PageTemplateLoader(os.path.join(currentdir, "src", "lang_templates"))
+lang_templates_path = os.path.join(currentdir, "src", "lang_templates")
+lang_templates = PageTemplateLoader(lang_templates_path)
 
 # get args passed by makefile
 makefile_args = utils.get_makefile_args(sys)
 
 lang_src = os.path.join(currentdir, "src", "lang")
-lang_dst = os.path.join(firs.generated_files_path, "lang")
-
-if os.path.exists(lang_dst):
-    shutil.rmtree(lang_dst)
-shutil.copytree(lang_src, lang_dst)
-hint_file = codecs.open(
-    os.path.join(lang_dst, "_lang_files_here_are_generated.txt"), "w", "utf8"
-)
-hint_file.write(
-    "Don't edit the lang files here.  They're generated by the build script. \n Edit the ones in lang_src instead."
-)
-hint_file.close()
+lang_dst = os.path.join(generated_files_path, "lang")
 
 
 def main():
     start = time()
     print("[RENDER LANG] render_lang.py")
+
+    if os.path.exists(lang_dst):
+        shutil.rmtree(lang_dst)
+    shutil.copytree(lang_src, lang_dst)
+    hint_file = codecs.open(
+        os.path.join(lang_dst, "_lang_files_here_are_generated.txt"), "w", "utf8"
+    )
+    hint_file.write(
+        "Don't edit the lang files here.  They're generated by the build script. \n Edit the ones in lang_src instead."
+    )
+    hint_file.close()
     # consists = firs.get_consists_in_buy_menu_order()
 
     languages_with_generation = ("english",)
     for i in languages_with_generation:
         # compile strings to single lang file - english
-        lang_template = lang_templates[i + ".pylng"]
-
-        src_file = codecs.open(os.path.join(lang_src, i + ".lng"), "r", "utf8")
-        dst_file = codecs.open(os.path.join(lang_dst, i + ".lng"), "w", "utf8")
-        lang_content = src_file.read()
-        lang_content = lang_content + lang_template(
-            makefile_args=makefile_args, utils=utils, git_info=git_info
-        )
-        dst_file.write(lang_content)
-        dst_file.close()
-
+        with profiling.span("lang " + i):
+            lang_template = lang_templates[i + ".pylng"]
+
+            src_file = codecs.open(os.path.join(lang_src, i + ".lng"), "r", "utf8")
+            dst_file = codecs.open(os.path.join(lang_dst, i + ".lng"), "w", "utf8")
+            lang_content = src_file.read()
+            lang_content = lang_content + lang_template(
+                makefile_args=makefile_args, utils=utils, git_info=git_info
+            )
+            dst_file.write(lang_content)
+            dst_file.close()
+
+    utils.write_makefile_dependencies(
+        lang_dst,
+        lang_dst + ".d",
+        utils.get_src_module_paths()
+        + [os.path.join(lang_src, lang_file) for lang_file in os.listdir(lang_src)]
+        + [
+            os.path.join(lang_templates_path, i + ".pylng")
+            for i in languages_with_generation
+        ],
+    )
+
+    profiling.write_profile("render_lang")
+    template_cache.report()
     print(format((time() - start), ".2f") + "s")
 
 
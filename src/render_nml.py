@@ -4,12 +4,31 @@ import codecs  # used for writing files - more unicode friendly than standard op
 
 import sys
 import os
+import multiprocessing
+import shutil
+import re
+import hashlib
+import json
 
 currentdir = os.curdir
 from time import time
 
-import firs
 import utils
+import profiling
+
+# get args passed by makefile
+makefile_args = utils.get_makefile_args(sys)
+
+# with a test industry, firs only needs to register the test industry and the industries it references
+# firs builds the registry when it's imported, so this is passed by environment (as chameleon is configured)
+if makefile_args.get("test_industry", None):
+    os.environ["FIRS_TEST_INDUSTRY_CLOSURE"] = makefile_args["test_industry"]
+
+with profiling.span("import firs"):
+    import firs
+import template_cache
+import deduplicate_nml
+import snow_graphics
 import global_constants
 from polar_fox import git_info
 from incompatible_grfs import incompatible_grfs
@@ -22,86 +41,526 @@ incompatible_industries = firs.incompatible_industries
 from chameleon import PageTemplateLoader  # chameleon used in most template cases
 
 # setup the places we look for templates
-templates = PageTemplateLoader(
-    os.path.join(currentdir, "src", "templates"), format="text"
-)
+templates_path = os.path.join(currentdir, "src", "templates")
+templates = PageTemplateLoader(templates_path, format="text")
 
 generated_nml_path = os.path.join(firs.generated_files_path, "nml")
 if not os.path.exists(generated_nml_path):
     os.mkdir(generated_nml_path)
+# records a hash of the inputs each industry's nml was rendered from, so unchanged industries can be reused
+# and the name and size of each nml file in firs.nml, in order, so the unchanged start of firs.nml can be kept when linking
+nml_manifest_path = os.path.join(generated_nml_path, "manifest.json")
+# duplicate switches are removed from each nml file in turn, into a file of the same name here, and firs.nml is linked from these
+deduplicated_nml_path = os.path.join(generated_nml_path, "deduplicated")
+if not os.path.exists(deduplicated_nml_path):
+    os.mkdir(deduplicated_nml_path)
+
+# templates for the start of firs.nml, before the industries, in order
+header_items = [
+    "header",
+    "checks",
+    "parameters",
+    "cargos",
+    "colour",
+    "procedures_fences",
+    "procedures_terrain_sprite",
+    "randomise_primary_production_on_build",
+    "sprite_templates",
+    "construction_states",
+    "ground_tiles",
+]
 
-# get args passed by makefile
-makefile_args = utils.get_makefile_args(sys)
+
+def get_header_item_template_args():
+    # get_header_item_nml_hashes() needs a fingerprint for each of these
+    return dict(
+        registered_industries=registered_industries,
+        registered_cargos=registered_cargos,
+        economies=registered_economies,
+        incompatible_grfs=incompatible_grfs,
+        global_constants=global_constants,
+        graphics_temp_storage=global_constants.graphics_temp_storage,  # convenience measure
+        makefile_args=makefile_args,
+        utils=utils,
+        sys=sys,
+        git_info=git_info,
+    )
 
 
 def render_header_item_nml(header_item):
     template = templates[header_item + ".pynml"]
-    result = utils.unescape_chameleon_output(
-        template(
-            registered_industries=registered_industries,
-            registered_cargos=registered_cargos,
-            economies=registered_economies,
-            incompatible_grfs=incompatible_grfs,
-            global_constants=global_constants,
-            graphics_temp_storage=global_constants.graphics_temp_storage,  # convenience measure
-            makefile_args=makefile_args,
-            utils=utils,
-            sys=sys,
-            git_info=git_info,
+    with profiling.span("template " + header_item + ".pynml"):
+        templated_nml = template(**get_header_item_template_args())
+    # write the nml per vehicle to disk, it aids debugging, and firs.nml is assembled from these files
+    with profiling.span("unescape chameleon output and write nml"):
+        nml_file = utils.UnescapedChameleonOutputWriter(
+            codecs.open(get_header_item_nml_path(header_item), "w", "utf8")
         )
-    )
-    # write the nml per vehicle to disk, it aids debugging
+        nml_file.write(templated_nml)
+        nml_file.close()
+
+
+def get_header_item_nml_path(header_item):
     # ! clunky split to get rid of the extension - temporary artefact of migrating away from CPP
     header_item_name = header_item.split(".")[0]
-    nml_file = os.path.join(generated_nml_path, header_item_name + ".nml")
-    nml = codecs.open(nml_file, "w", "utf8")
-    nml.write(result)
-    nml.close()
-    # also return the nml directly for writing to the concatenated nml, don't faff around opening the generated nml files from disk
-    return result
+    return os.path.join(generated_nml_path, header_item_name + ".nml")
 
 
-def render_industry_nml(industry):
+def industry_is_built(industry):
+    # when a test industry is set, all other industries are left out of firs.nml
+    # (their nml files and manifest hashes are kept as they are, for the next full build)
     only_build_test_industry = makefile_args.get("test_industry", None)
-    if not only_build_test_industry or only_build_test_industry == industry.id:
-        result = industry.render_nml(incompatible_industries=incompatible_industries)
-    else:
-        result = ""
-    # write the nml per vehicle to disk, it aids debugging
-    nml_file = codecs.open(
-        os.path.join(generated_nml_path, industry.id + ".nml"), "w", "utf8"
+    return not only_build_test_industry or only_build_test_industry == industry.id
+
+
+def render_industry_nml(industry):
+    # write the nml per vehicle to disk, it aids debugging, and firs.nml is assembled from these files
+    nml_file = codecs.open(get_industry_nml_path(industry), "w", "utf8")
+    industry.render_nml(
+        incompatible_industries=incompatible_industries, nml_file=nml_file
+    )
+
+
+def get_industry_nml_path(industry):
+    return os.path.join(generated_nml_path, industry.id + ".nml")
+
+
+def get_shared_src_module_paths():
+    # every src module, except the industry modules
+    src_path = os.path.join(currentdir, "src")
+    return utils.get_src_file_paths(
+        sorted(
+            file_name for file_name in os.listdir(src_path) if file_name.endswith(".py")
+        )
+        + ["cargos", "economies", "polar_fox"]
+    )
+
+
+def get_header_item_nml_hashes(header_items, industry_nml_hashes):
+    # content hash of everything a header item's nml is rendered from, so e.g. an industry edit doesn't re-render cargos.pynml
+    # templates call into src modules, which read other modules (e.g. cargo.get_cargo_colour() reads global_constants)
+    # so which modules a header item reads can't be found from its templates, and every header item hashes all the shared src modules
+    # the industry modules are only read through registered_industries, which is fingerprinted by the hashes of the industry nml
+    # the other inputs a header item reads are found by looking for the template args by name in its templates
+    # fingerprints are only computed for inputs that are read (git_info in particular costs a subprocess)
+    input_fingerprints = {
+        # industries don't have a source module of their own, so use the hashes of everything their nml is rendered from
+        "registered_industries": lambda: repr(sorted(industry_nml_hashes.items())),
+        "makefile_args": lambda: repr(sorted(makefile_args.items())),
+        "sys": lambda: repr((sys.version, sys.argv)),
+        "git_info": lambda: repr((git_info.get_revision(), git_info.get_version())),
+    }
+    # template args that are only src modules (or objects from them), so they're covered by the shared src modules
+    shared_src_module_args = [
+        "registered_cargos",
+        "economies",
+        "incompatible_grfs",
+        "global_constants",
+        "graphics_temp_storage",
+        "utils",
+    ]
+    if set(input_fingerprints) | set(shared_src_module_args) != set(
+        get_header_item_template_args()
+    ):
+        raise Exception(
+            "header item template args and input fingerprints don't match, update get_header_item_nml_hashes()"
+        )
+    shared_hash = hashlib.md5()
+    utils.update_hash_from_files(shared_hash, get_shared_src_module_paths())
+    input_hashes = {}
+    result = {}
+    for header_item in header_items:
+        header_item_hash = shared_hash.copy()
+        template_text = ""
+        for template_name in utils.get_template_dependencies(
+            templates_path, header_item + ".pynml"
+        ):
+            with open(
+                os.path.join(templates_path, template_name), "r", encoding="utf8"
+            ) as template_file:
+                template_text += template_file.read()
+        header_item_hash.update(template_text.encode("utf8"))
+        for input_name, input_fingerprint in input_fingerprints.items():
+            if re.search(r"\b" + input_name + r"\b", template_text) is None:
+                continue
+            if input_name not in input_hashes:
+                input_hashes[input_name] = input_fingerprint()
+            header_item_hash.update(
+                (input_name + input_hashes[input_name]).encode("utf8")
+            )
+        result[header_item] = header_item_hash.hexdigest()
+    return result
+
+
+def get_industry_nml_hashes(built_industries):
+    # content hash of everything an industry's nml is rendered from
+    # inputs shared by all industries: the industry / utils framework, global constants, and the economy definitions
+    shared_hash = hashlib.md5()
+    utils.update_hash_from_files(
+        shared_hash,
+        [
+            os.path.join(currentdir, "src", module_name + ".py")
+            for module_name in ["industry", "utils", "global_constants"]
+        ],
     )
-    nml_file.write(result)
-    nml_file.close()
-    # also return the nml directly for writing to the concatenated nml, don't faff around opening the generated nml files from disk
+    for economy in registered_economies:
+        shared_hash.update(
+            repr((economy.id, economy.numeric_id, economy.cargo_ids)).encode("utf8")
+        )
+    template_dependencies = {}
+    result = {}
+    for industry in built_industries:
+        if industry.template not in template_dependencies:
+            template_dependencies[
+                industry.template
+            ] = utils.get_template_dependencies(templates_path, industry.template)
+        industry_hash = shared_hash.copy()
+        utils.update_hash_from_files(
+            industry_hash,
+            [os.path.join(currentdir, "src", "industries", industry.id + ".py")]
+            + [
+                os.path.join(templates_path, template_name)
+                for template_name in template_dependencies[industry.template]
+            ],
+        )
+        industry_hash.update(
+            repr(
+                sorted(
+                    incompatible_industry.id
+                    for incompatible_industry in incompatible_industries[industry]
+                )
+            ).encode("utf8")
+        )
+        industry_hash.update(
+            repr(sorted(industry.identical_snow_spritesets)).encode("utf8")
+        )
+        result[industry.id] = industry_hash.hexdigest()
     return result
 
 
+def get_empty_nml_manifest():
+    return {
+        "header_item_nml_hashes": {},
+        "industry_nml_hashes": {},
+        "fragments": [],
+    }
+
+
+def load_nml_manifest():
+    # a manifest that's missing, unreadable (e.g. truncated by an interrupted build), or from an older format means a full build
+    try:
+        with open(nml_manifest_path, "r", encoding="utf8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return get_empty_nml_manifest()
+    if (
+        not isinstance(manifest, dict)
+        or not isinstance(manifest.get("header_item_nml_hashes"), dict)
+        or not isinstance(manifest.get("industry_nml_hashes"), dict)
+        or not isinstance(manifest.get("fragments"), list)
+        or not isinstance(manifest.get("deduplication", {}), dict)
+        or not isinstance(
+            manifest.get("deduplication", {}).get("fragment_hashes", {}), dict
+        )
+    ):
+        return get_empty_nml_manifest()
+    return manifest
+
+
+def save_nml_manifest(manifest):
+    # written to a temporary file and then moved into place, so an interrupted build can't leave a partial manifest
+    utils.write_json_atomically(nml_manifest_path, manifest)
+
+
+def render_industry_nml_by_index(industry_index):
+    # when forked workers are used, only the index needs to cross the process boundary, not the industry object
+    industry = registered_industries[industry_index]
+    with profiling.span("industry " + industry.id):
+        render_industry_nml(industry)
+
+
+def render_industry_nml_in_worker(industry_index):
+    # the nml goes to disk, only spans recorded in the worker are returned, so the parent can include them in the profile
+    render_industry_nml_by_index(industry_index)
+    return profiling.pop_spans()
+
+
+def copy_file_contents(src_file, dst_file, size):
+    # copy between file descriptors in the kernel, the contents aren't read into python at all
+    # copy_file_range is linux only (and can fail across filesystems), sendfile to a regular file also needs linux
+    src_fd = src_file.fileno()
+    dst_fd = dst_file.fileno()
+    remaining = size
+    try:
+        while remaining > 0:
+            if hasattr(os, "copy_file_range"):
+                copied = os.copy_file_range(src_fd, dst_fd, remaining)
+            else:
+                copied = os.sendfile(dst_fd, src_fd, None, remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    except (AttributeError, OSError):
+        # no zero-copy available, fall back to a buffered copy of whatever wasn't copied yet
+        # the file objects don't know the descriptors have moved, so sync them first, and flush after
+        src_file.seek(size - remaining)
+        dst_file.seek(0, os.SEEK_END)
+        shutil.copyfileobj(src_file, dst_file)
+        dst_file.flush()
+
+
+def link_nml(linked_nml_path, nml_paths, rendered_nml_paths, previous_fragments):
+    # assemble the linked nml from the nml files, in order
+    # the linked nml is kept up to the first nml file that was written this build, or that differs from the previous link
+    # returns the fragments (nml file name and size) for the manifest
+    fragments = [
+        [os.path.basename(nml_path), os.path.getsize(nml_path)]
+        for nml_path in nml_paths
+    ]
+    unchanged_count = 0
+    if os.path.exists(linked_nml_path) and os.path.getsize(linked_nml_path) == sum(
+        size for name, size in previous_fragments
+    ):
+        for nml_path, fragment, previous_fragment in zip(
+            nml_paths, fragments, previous_fragments
+        ):
+            if nml_path in rendered_nml_paths or fragment != previous_fragment:
+                break
+            unchanged_count += 1
+    with open(linked_nml_path, "r+b" if unchanged_count > 0 else "wb") as linked_nml:
+        linked_nml.truncate(sum(size for name, size in fragments[0:unchanged_count]))
+        linked_nml.seek(0, os.SEEK_END)
+        for nml_path, (name, size) in zip(
+            nml_paths[unchanged_count:], fragments[unchanged_count:]
+        ):
+            with open(nml_path, "rb") as nml_file:
+                copy_file_contents(nml_file, linked_nml, size)
+    return fragments
+
+
+def get_deduplicated_nml_path(nml_path):
+    return os.path.join(deduplicated_nml_path, os.path.basename(nml_path))
+
+
+def deduplicate_nml_files(nml_paths, previous_deduplication):
+    # removes duplicate switches from the nml files, in link order, one file at a time (the linked nml is never in memory)
+    # a file's deduplicated nml depends on the file and every file before it, so each file gets a hash chained from the previous files
+    # files whose chained hash is unchanged keep their deduplicated nml file, so firs.nml can still be linked from them without copying
+    # returns the deduplicated nml files rewritten this build, and the chained hashes and switches and bytes removed for the manifest
+    previous_fragment_hashes = previous_deduplication.get("fragment_hashes", {})
+    fragment_hash = hashlib.md5()
+    utils.update_hash_from_files(
+        fragment_hash, utils.get_src_file_paths(["deduplicate_nml.py"])
+    )
+    fragment_hashes = {}
+    for nml_path in nml_paths:
+        utils.update_hash_from_files(fragment_hash, [nml_path])
+        fragment_hashes[os.path.basename(nml_path)] = fragment_hash.hexdigest()
+    stale_nml_paths = [
+        nml_path
+        for nml_path in nml_paths
+        if previous_fragment_hashes.get(os.path.basename(nml_path))
+        != fragment_hashes[os.path.basename(nml_path)]
+        or not os.path.exists(get_deduplicated_nml_path(nml_path))
+    ]
+    if len(stale_nml_paths) == 0:
+        removed_switches = previous_deduplication["removed_switches"]
+    else:
+        # the switches kept from every file are needed for the files after it, so all the files are read, but only stale files written
+        switch_deduplicator = deduplicate_nml.SwitchDeduplicator()
+        for nml_path in nml_paths:
+            with codecs.open(nml_path, "r", "utf8") as nml_file:
+                nml = switch_deduplicator.deduplicate(nml_file.read())
+            if nml_path in stale_nml_paths:
+                with codecs.open(
+                    get_deduplicated_nml_path(nml_path), "w", "utf8"
+                ) as deduplicated_nml_file:
+                    deduplicated_nml_file.write(nml)
+        removed_switches = switch_deduplicator.removed_count
+    return [get_deduplicated_nml_path(nml_path) for nml_path in stale_nml_paths], {
+        "fragment_hashes": fragment_hashes,
+        "removed_switches": removed_switches,
+        "removed_bytes": sum(os.path.getsize(nml_path) for nml_path in nml_paths)
+        - sum(
+            os.path.getsize(get_deduplicated_nml_path(nml_path))
+            for nml_path in nml_paths
+        ),
+    }
+
+
+def warm_industry_templates():
+    # compile the industry templates once in the parent, so forked workers inherit them rather than each compiling their own copy
+    for template_name in set(industry.template for industry in registered_industries):
+        template = templates[template_name]
+        template.cook_check()
+        # 'load:' templates are loaded through the template's own (memoised) loader, so warm those the same way
+        for loaded_template_name in utils.get_template_dependencies(
+            templates_path, template_name
+        )[1:]:
+            template._loader(loaded_template_name).cook_check()
+
+
 def main():
     start = time()
-    grf_nml = codecs.open(
-        os.path.join(firs.generated_files_path, "firs.nml"), "w", "utf8"
-    )
-    header_items = [
-        "header",
-        "checks",
-        "parameters",
-        "cargos",
-        "colour",
-        "procedures_fences",
-        "procedures_terrain_sprite",
-        "randomise_primary_production_on_build",
-        "sprite_templates",
-        "construction_states",
-        "ground_tiles",
+    grf_nml_path = os.path.join(firs.generated_files_path, "firs.nml")
+
+    # header items and industries whose inputs haven't changed since the last build reuse their nml file from generated/nml
+    manifest = load_nml_manifest()
+    built_industries = [
+        industry for industry in registered_industries if industry_is_built(industry)
     ]
-    for header_item in header_items:
-        grf_nml.write(render_header_item_nml(header_item))
+    with profiling.span("find identical snow spritesets"):
+        snow_graphics_paths = snow_graphics.find_identical_snow_spritesets(
+            built_industries
+        )
+    with profiling.span("hash industry inputs"):
+        industry_nml_hashes = get_industry_nml_hashes(built_industries)
+    with profiling.span("hash header item inputs"):
+        header_item_nml_hashes = get_header_item_nml_hashes(
+            header_items, industry_nml_hashes
+        )
+    stale_header_items = [
+        header_item
+        for header_item in header_items
+        if manifest.get("header_item_nml_hashes", {}).get(header_item)
+        != header_item_nml_hashes[header_item]
+        or not os.path.exists(get_header_item_nml_path(header_item))
+    ]
+    for header_item in stale_header_items:
+        with profiling.span("header item " + header_item):
+            render_header_item_nml(header_item)
+
+    stale_industry_indexes = [
+        industry_index
+        for industry_index, industry in enumerate(registered_industries)
+        if industry_is_built(industry)
+        and (
+            manifest["industry_nml_hashes"].get(industry.id)
+            != industry_nml_hashes[industry.id]
+            or not os.path.exists(get_industry_nml_path(industry))
+        )
+    ]
+
+    # multiprocessing with fresh pythons was empirically slower (overhead of re-importing the registry in every worker)
+    # so fork workers *after* the registry is built and templates are compiled, and they inherit that state for free
+    if (
+        makefile_args.get("no_mp", None)
+        or makefile_args.get("test_industry", None)
+        or len(stale_industry_indexes) < 2
+    ):
+        pool = None
+        rendered_industries = map(render_industry_nml_by_index, stale_industry_indexes)
+    else:
+        with profiling.span("warm industry templates"):
+            warm_industry_templates()
+        pool = multiprocessing.get_context("fork").Pool(
+            processes=multiprocessing.cpu_count(), initializer=profiling.clear_spans
+        )
+        rendered_industries = pool.imap(
+            render_industry_nml_in_worker, stale_industry_indexes
+        )
+
+    with profiling.span("industries"):
+        for worker_spans in rendered_industries:
+            if pool is not None:
+                profiling.add_spans(worker_spans)
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-    # multiprocessing was tried here and removed as it was empirically slower in testing (due to overhead of starting extra pythons probably)
-    for industry in registered_industries:
-        grf_nml.write(render_industry_nml(industry))
-    grf_nml.close()
+    # firs.nml is linked from the nml files, in order, after duplicate switches are removed from them
+    nml_paths = [
+        get_header_item_nml_path(header_item) for header_item in header_items
+    ] + [get_industry_nml_path(industry) for industry in built_industries]
+    with profiling.span("deduplicate switches"):
+        rewritten_nml_paths, deduplication = deduplicate_nml_files(
+            nml_paths, manifest.get("deduplication", {})
+        )
+    with profiling.span("link nml"):
+        fragments = link_nml(
+            grf_nml_path,
+            [get_deduplicated_nml_path(nml_path) for nml_path in nml_paths],
+            rewritten_nml_paths,
+            manifest["fragments"],
+        )
+    # firs.nml may be unchanged, but make needs it to be newer than the prerequisites that triggered this build
+    os.utime(grf_nml_path)
+    print(
+        "[DEDUPLICATE NML] removed "
+        + str(deduplication["removed_switches"])
+        + " duplicate switches ("
+        + str(deduplication["removed_bytes"])
+        + " bytes)"
+    )
+    if makefile_args.get("test_industry", None):
+        # the nml files of other industries weren't touched, so keep their hashes
+        industry_nml_hashes = dict(
+            manifest["industry_nml_hashes"], **industry_nml_hashes
+        )
+        deduplication["fragment_hashes"] = dict(
+            manifest.get("deduplication", {}).get("fragment_hashes", {}),
+            **deduplication["fragment_hashes"]
+        )
+    save_nml_manifest(
+        {
+            "header_item_nml_hashes": header_item_nml_hashes,
+            "industry_nml_hashes": industry_nml_hashes,
+            "fragments": fragments,
+            "deduplication": deduplication,
+        }
+    )
+
+    # templates are found statically, as templates loaded in forked workers aren't visible here
+    used_templates = []
+    for template_name in header_items + [
+        industry.template for industry in registered_industries
+    ]:
+        utils.get_template_dependencies(templates_path, template_name, used_templates)
+    # the nml depends on the pixels of the snow graphics compared, and on which images exist
+    # (the graphics dir changes when images are added or removed, which can change which snow spritesets are needed)
+    snow_graphics_prerequisites = snow_graphics_paths + [snow_graphics.graphics_path]
+    if makefile_args.get("test_industry", None):
+        # only the test industry closure was imported, and firs.nml only has the test industry, so the next build must run again
+        utils.remove_makefile_dependencies(grf_nml_path + ".d")
+    else:
+        utils.write_makefile_dependencies(
+            grf_nml_path,
+            grf_nml_path + ".d",
+            utils.get_src_module_paths()
+            + [
+                os.path.join(templates_path, template_name)
+                for template_name in used_templates
+            ]
+            + snow_graphics_prerequisites,
+        )
+    # worst case tile reads per placement attempt, the slowest industry is reported on every build, each industry when profiling
+    houses_nearby_tile_reads = {
+        industry.id: industry.get_houses_nearby_tile_reads()
+        for industry in built_industries
+    }
+    if profiling.enabled:
+        for industry_id, tile_reads in houses_nearby_tile_reads.items():
+            if tile_reads > 0:
+                print(
+                    "[LOCATION CHECKS] "
+                    + industry_id
+                    + ": require_houses_nearby reads up to "
+                    + str(tile_reads)
+                    + " tiles per placement attempt"
+                )
+    elif sum(houses_nearby_tile_reads.values()) > 0:
+        slowest_industry_id = max(
+            houses_nearby_tile_reads, key=houses_nearby_tile_reads.get
+        )
+        print(
+            "[LOCATION CHECKS] require_houses_nearby reads up to "
+            + str(houses_nearby_tile_reads[slowest_industry_id])
+            + " tiles per placement attempt ("
+            + slowest_industry_id
+            + "), PROFILE=True reports each industry"
+        )
+    profiling.write_profile("render_nml")
+    template_cache.report()
     # eh, how long does this take anyway?
     print(format((time() - start), ".2f") + "s")
 
@@ -0,0 +1,106 @@
+"""
+Industries have snow graphics ([industry]_[n]_snow.png) alongside the default graphics ([industry]_[n].png).
+For many spritesets the snow graphics are the same pixels as the default graphics (snow is only drawn on some of the buildings),
+in which case only the default spriteset is needed, and the snow spriteset name can refer to it.
+Comparing the images means decoding them, so results are cached by the hashes of the image files.
+"""
+
+import os
+import json
+import hashlib
+
+from PIL import Image
+
+import utils
+
+currentdir = os.curdir
+
+graphics_path = os.path.join(currentdir, "src", "graphics", "industries")
+# "[default image hash] [snow image hash]" -> {repr of spriteset sprites: True if the snow pixels are the same}
+identical_snow_spritesets_cache_path = os.path.join(
+    utils.get_generated_files_path(), "identical_snow_spritesets.json"
+)
+
+
+def load_cache():
+    if not os.path.exists(identical_snow_spritesets_cache_path):
+        return {}
+    with open(identical_snow_spritesets_cache_path, "r", encoding="utf8") as cache_file:
+        return json.load(cache_file)
+
+
+def save_cache(cache):
+    with open(identical_snow_spritesets_cache_path, "w", encoding="utf8") as cache_file:
+        json.dump(cache, cache_file, indent=4, sort_keys=True)
+
+
+def get_file_hash(file_path):
+    file_hash = hashlib.md5()
+    utils.update_hash_from_files(file_hash, [file_path])
+    return file_hash.hexdigest()
+
+
+def sprites_are_identical(default_image, snow_image, sprites):
+    # nml uses the palette indexes of 8bpp images, so those are compared directly, rather than the colours
+    if default_image.mode != snow_image.mode:
+        return False
+    if default_image.getpalette() != snow_image.getpalette():
+        return False
+    for sprite in sprites:
+        # sprites are (x, y, w, h, xoffs, yoffs)
+        box = (sprite[0], sprite[1], sprite[0] + sprite[2], sprite[1] + sprite[3])
+        if default_image.crop(box).tobytes() != snow_image.crop(box).tobytes():
+            return False
+    return True
+
+
+def find_identical_snow_spritesets(industries):
+    # sets industry.identical_snow_spritesets for each industry (which are spriteset names without the _snow suffix)
+    # returns the paths of the images compared, as the nml depends on their pixels
+    # cached results are found by the hashes of the images, so an edited image is always compared again
+    cache = load_cache()
+    image_paths = []
+    for industry in industries:
+        industry.identical_snow_spritesets = set()
+        building_spritesets = [
+            spriteset for spriteset in industry.spritesets if spriteset.type == ""
+        ]
+        for date_variation_num in range(len(industry.graphics_change_dates) + 1):
+            default_image_path = os.path.join(
+                graphics_path,
+                industry.id + "_" + str(date_variation_num + 1) + ".png",
+            )
+            snow_image_path = os.path.join(
+                graphics_path,
+                industry.id + "_" + str(date_variation_num + 1) + "_snow.png",
+            )
+            # without both images, keep the snow spritesets as they are
+            if not os.path.exists(default_image_path) or not os.path.exists(
+                snow_image_path
+            ):
+                continue
+            image_paths.extend([default_image_path, snow_image_path])
+            cached_results = cache.setdefault(
+                get_file_hash(default_image_path)
+                + " "
+                + get_file_hash(snow_image_path),
+                {},
+            )
+            default_image = None
+            snow_image = None
+            for spriteset in building_spritesets:
+                sprites_key = repr(spriteset.sprites)
+                if sprites_key not in cached_results:
+                    # images are only opened when something isn't cached
+                    if default_image is None:
+                        default_image = Image.open(default_image_path)
+                        snow_image = Image.open(snow_image_path)
+                    cached_results[sprites_key] = sprites_are_identical(
+                        default_image, snow_image, spriteset.sprites
+                    )
+                if cached_results[sprites_key]:
+                    industry.identical_snow_spritesets.add(
+                        spriteset.id + "_" + str(date_variation_num)
+                    )
+    save_cache(cache)
+    return image_paths
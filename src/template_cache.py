@@ -0,0 +1,71 @@
+"""
+Chameleon compiles each template to a python module, which is cached in .chameleon_cache and reused by later builds.
+This records, per template, whether it was loaded from the cache or had to be compiled (a cache miss),
+so the render scripts can report whether the cache is actually being used.
+Import this before any templates are loaded.
+src/precompile.py ('make precompile') compiles all templates into the cache ahead of rendering, e.g. once in CI.
+"""
+
+import os
+
+import utils
+
+# chameleon reads the cache location when it's imported, so set that up first
+chameleon_cache_path = utils.setup_chameleon_cache()
+
+from chameleon.loader import ModuleLoader
+from chameleon.template import BaseTemplate
+
+# template path -> "hit" or "miss", for each template loaded by this process since the last report
+template_cache_results = {}
+# module loader build() is only called when the compiled template isn't found in the cache
+modules_built = []
+
+base_template_cook = BaseTemplate._cook
+module_loader_build = ModuleLoader.build
+
+
+def cook(self, body, name, builtins):
+    built_count = len(modules_built)
+    result = base_template_cook(self, body, name, builtins)
+    template_path = os.path.relpath(str(self.filename))
+    # the same template can be loaded by more than one template loader, if it missed once, report it as a miss
+    if len(modules_built) > built_count:
+        template_cache_results[template_path] = "miss"
+    else:
+        template_cache_results.setdefault(template_path, "hit")
+    return result
+
+
+def build(self, source, filename):
+    modules_built.append(filename)
+    return module_loader_build(self, source, filename)
+
+
+BaseTemplate._cook = cook
+ModuleLoader.build = build
+
+
+def report():
+    # reports (and then forgets) the templates loaded since the last report; watch mode reports once per render
+    hits = sorted(
+        template_path
+        for template_path, result in template_cache_results.items()
+        if result == "hit"
+    )
+    misses = sorted(
+        template_path
+        for template_path, result in template_cache_results.items()
+        if result == "miss"
+    )
+    for template_path in misses:
+        print("[TEMPLATE CACHE] miss (compiled): " + template_path)
+    print(
+        "[TEMPLATE CACHE] "
+        + str(len(hits))
+        + " templates loaded from cache, "
+        + str(len(misses))
+        + " compiled"
+    )
+    template_cache_results.clear()
+    return hits, misses
@@ -1,5 +1,8 @@
 from PIL import Image
 import os.path
+import re
+import json
+import sys
 import codecs  # used for writing files - more unicode friendly than standard open() module
 import global_constants
 from polar_fox import git_info
@@ -11,6 +14,7 @@ def get_makefile_args(sys):
         makefile_args = {
             "test_industry": sys.argv[1],
             "no_mp": sys.argv[2],
+            "profile": sys.argv[3] if len(sys.argv) > 3 else "",
         }
     else:
         # provide any necessary defaults here
@@ -18,6 +22,23 @@ def get_makefile_args(sys):
     return makefile_args
 
 
+def setup_chameleon_cache():
+    # setting up a cache for compiled chameleon templates can significantly speed up template rendering
+    # chameleon reads the cache location when it is imported, so call this before importing chameleon
+    chameleon_cache_path = os.path.join(os.curdir, global_constants.chameleon_cache_dir)
+    if not os.path.exists(chameleon_cache_path):
+        os.mkdir(chameleon_cache_path)
+    os.environ["CHAMELEON_CACHE"] = chameleon_cache_path
+    return chameleon_cache_path
+
+
+def get_generated_files_path():
+    generated_files_path = os.path.join(os.curdir, global_constants.generated_files_dir)
+    if not os.path.exists(generated_files_path):
+        os.mkdir(generated_files_path)
+    return generated_files_path
+
+
 def get_docs_url():
     # not convinced this belongs in utils, but I can't find anywhere better to put it
     # could be in polar fox - method will be common to all grfs? - pass the project name as a var?
@@ -29,18 +50,147 @@ def get_docs_url():
     return "/".join(result)
 
 
+# chameleon html-escapes some characters; that's sane and secure for chameleon's intended web use, but not wanted for nml
+chameleon_entities = {"&gt;": ">", "&lt;": "<", "&amp;": "&"}
+chameleon_entities_pattern = re.compile("&(?:gt|lt|amp);")
+
+
+def unescape_chameleon_entity(match):
+    return chameleon_entities[match.group()]
+
+
+def unescape_chameleon_lines(lines):
+    # drops as much whitespace as we sensibly can, and decodes the entities, in one pass over the lines
+    # in tests, dropping whitespace doesn't make the compile any faster at all, but it reduced firs.nml (v3.0.4) from 326k lines to 226k lines
+    return chameleon_entities_pattern.sub(
+        unescape_chameleon_entity,
+        "\n".join([line for line in lines if line.strip(" \t\r") != ""]),
+    )
+
+
 def unescape_chameleon_output(escaped_nml):
-    # first drop as much whitespace as we sensibly can
-    # in tests, this doesn't make the compile any faster at all, but it reduced firs.nml (v3.0.4) from 326k lines to 226k lines,
-    escaped_nml = "\n".join(
-        [x for x in escaped_nml.split("\n") if x.strip(" \t\n\r") != ""]
+    return unescape_chameleon_lines(escaped_nml.split("\n"))
+
+
+class UnescapedChameleonOutputWriter(object):
+    """
+    Wraps a file, unescaping chameleon output written to it on the way to disk.
+    The file gets the same content as unescape_chameleon_output() on everything written.
+    Chameleon renders a template to one string, so that string is written in one go, but it's unescaped a chunk of lines at a time;
+    the lists and strings made while unescaping are about the size of a chunk, not the size of the whole template output.
+    close() must be called to write the last line (it closes the wrapped file too).
+    """
+
+    # characters unescaped at a time, small enough that unescaping adds little to peak memory, big enough that it's still fast
+    chunk_size = 65536
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        # the last line written may be continued by the next write, so it's held back until the line is complete
+        self.partial_line = ""
+        # lines are joined with newlines, without a trailing newline, so the separator is only written once there's a previous line
+        self.line_separator = ""
+
+    def write(self, escaped_nml):
+        for start in range(0, len(escaped_nml), self.chunk_size):
+            self.write_chunk(escaped_nml[start : start + self.chunk_size])
+
+    def write_chunk(self, escaped_nml):
+        lines = (self.partial_line + escaped_nml).split("\n")
+        self.partial_line = lines.pop()
+        self.write_lines(lines)
+
+    def write_lines(self, lines):
+        unescaped_nml = unescape_chameleon_lines(lines)
+        if unescaped_nml != "":
+            self.output_file.write(self.line_separator + unescaped_nml)
+            self.line_separator = "\n"
+
+    def close(self):
+        self.write_lines([self.partial_line])
+        self.partial_line = ""
+        self.output_file.close()
+
+
+def update_hash_from_files(hash, file_paths):
+    for file_path in file_paths:
+        with open(file_path, "rb") as hashed_file:
+            hash.update(hashed_file.read())
+
+
+def write_json_atomically(file_path, data):
+    # os.replace is atomic, so readers see either the previous file or the complete new file, never part of a file
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, "w", encoding="utf8") as temp_file:
+        json.dump(data, temp_file, indent=4, sort_keys=True)
+    os.replace(temp_file_path, file_path)
+
+
+def get_src_file_paths(names):
+    # names are files or packages in src, packages are expanded to their python files
+    result = []
+    for name in names:
+        path = os.path.join(os.curdir, "src", name)
+        if os.path.isdir(path):
+            result.extend(
+                os.path.join(path, file_name)
+                for file_name in sorted(os.listdir(path))
+                if file_name.endswith(".py")
+            )
+        else:
+            result.append(path)
+    return result
+
+
+def get_template_dependencies(templates_path, template_name, result=None):
+    # follow 'load:' expressions to find every template pulled in by a template (including the template itself)
+    # names that aren't files (e.g. commented-out includes of templates that no longer exist) are skipped
+    if result is None:
+        result = []
+    template_path = os.path.join(templates_path, template_name)
+    if template_name in result or not os.path.exists(template_path):
+        return result
+    result.append(template_name)
+    with open(template_path, "r", encoding="utf8") as template_file:
+        for loaded_template_name in re.findall(
+            r"load:\s*([\w.]+)", template_file.read()
+        ):
+            get_template_dependencies(templates_path, loaded_template_name, result)
+    return result
+
+
+def get_src_module_paths():
+    # paths of all python modules that have been imported from src, i.e. the python code an output actually used
+    src_path = os.path.abspath(os.path.join(os.curdir, "src"))
+    result = []
+    for module in list(sys.modules.values()):
+        module_path = getattr(module, "__file__", None)
+        if module_path is not None and os.path.abspath(module_path).startswith(
+            src_path + os.sep
+        ):
+            result.append(module_path)
+    return result
+
+
+def write_makefile_dependencies(target, dependency_file_path, prerequisites):
+    # writes a gcc-style dependency file (as gcc -MD -MP would) for the Makefile to include
+    # make can then skip a render stage if none of the files that stage actually used have changed
+    # the empty rule per prerequisite stops make failing if a prerequisite is deleted
+    prerequisites = sorted(set(os.path.relpath(path) for path in prerequisites))
+    dependency_file = codecs.open(dependency_file_path, "w", "utf8")
+    dependency_file.write(
+        os.path.relpath(target) + ": " + " \\\n ".join(prerequisites) + "\n"
     )
-    # chameleon html-escapes some characters; that's sane and secure for chameleon's intended web use, but not wanted for nml
-    # there is probably a standard module for unescaping html entities, but this will do for now
-    escaped_nml = ">".join(escaped_nml.split("&gt;"))
-    escaped_nml = "<".join(escaped_nml.split("&lt;"))
-    escaped_nml = "&".join(escaped_nml.split("&amp;"))
-    return escaped_nml
+    for prerequisite in prerequisites:
+        dependency_file.write("\n" + prerequisite + ":\n")
+    dependency_file.close()
+
+
+def remove_makefile_dependencies(dependency_file_path):
+    # a test industry build only uses part of FIRS, so its prerequisites would let make skip the next full build
+    # without the dependency file, the Makefile always runs the stage again
+    if os.path.exists(dependency_file_path):
+        os.remove(dependency_file_path)
 
 
 def split_nml_string_lines(text):
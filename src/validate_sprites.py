@@ -0,0 +1,165 @@
+"""
+Spriteset sprites are (x, y, w, h, xoffs, yoffs) rectangles in the industry spritesheets, which nmlc only checks when it compiles the grf.
+This checks every building sprite rectangle against each spritesheet the industry uses (default, _snow and _construction_N),
+so mistakes are found before nmlc starts:
+- rectangles that aren't inside the spritesheet (or spritesheets that are missing) are errors
+- rectangles that are entirely transparent (palette index 0) are warnings, they're probably the wrong place in the spritesheet
+Each spritesheet is decoded once, and results are cached by the hash of the spritesheet, so only changed spritesheets or sprites are checked.
+"""
+
+import os
+import json
+import hashlib
+import multiprocessing
+
+from PIL import Image
+
+import utils
+
+currentdir = os.curdir
+
+graphics_path = os.path.join(currentdir, "src", "graphics", "industries")
+# "[spritesheet hash]" -> {"x y w h": "ok", "out of bounds" or "transparent"}
+validated_sprites_cache_path = os.path.join(
+    utils.get_generated_files_path(), "validated_sprites.json"
+)
+
+
+def load_cache():
+    if not os.path.exists(validated_sprites_cache_path):
+        return {}
+    with open(validated_sprites_cache_path, "r", encoding="utf8") as cache_file:
+        return json.load(cache_file)
+
+
+def save_cache(cache):
+    with open(validated_sprites_cache_path, "w", encoding="utf8") as cache_file:
+        json.dump(cache, cache_file, indent=4, sort_keys=True)
+
+
+def get_file_hash(file_path):
+    file_hash = hashlib.md5()
+    utils.update_hash_from_files(file_hash, [file_path])
+    return file_hash.hexdigest()
+
+
+def get_rectangle_key(sprite):
+    # only the rectangle matters, the offsets don't
+    return " ".join(str(i) for i in sprite[0:4])
+
+
+def validate_rectangles(job):
+    # returns {"x y w h": result} for the rectangles in one spritesheet
+    spritesheet_path, rectangle_keys = job
+    image = Image.open(spritesheet_path)
+    image.load()
+    result = {}
+    for rectangle_key in rectangle_keys:
+        x, y, w, h = [int(i) for i in rectangle_key.split(" ")]
+        if x < 0 or y < 0 or w <= 0 or h <= 0:
+            result[rectangle_key] = "out of bounds"
+        elif x + w > image.size[0] or y + h > image.size[1]:
+            result[rectangle_key] = "out of bounds"
+        # the highest palette index in the rectangle is 0 only if every pixel is 0
+        elif image.crop((x, y, x + w, y + h)).getextrema()[1] == 0:
+            result[rectangle_key] = "transparent"
+        else:
+            result[rectangle_key] = "ok"
+    return result
+
+
+def get_spritesheet_rectangle_keys(industry):
+    # building spritesets use every spritesheet of the industry, other types of spritesets use the shared ground tiles
+    rectangle_keys = []
+    for spriteset in industry.spritesets:
+        if spriteset.type == "":
+            for sprite in spriteset.sprites:
+                rectangle_key = get_rectangle_key(sprite)
+                if rectangle_key not in rectangle_keys:
+                    rectangle_keys.append(rectangle_key)
+    return rectangle_keys
+
+
+def validate_industry_spritesheets(industries, use_multiprocessing=True):
+    cache = load_cache()
+    errors = []
+    # (spritesheet file name, cached results, rectangle keys)
+    spritesheets = []
+    for industry in industries:
+        rectangle_keys = get_spritesheet_rectangle_keys(industry)
+        if len(rectangle_keys) == 0:
+            continue
+        for file_name in industry.get_graphics_file_names():
+            spritesheet_path = os.path.join(graphics_path, file_name)
+            if not os.path.exists(spritesheet_path):
+                errors.append(
+                    industry.id
+                    + " has building spritesets, but "
+                    + file_name
+                    + " is missing"
+                )
+                continue
+            cached_results = cache.setdefault(get_file_hash(spritesheet_path), {})
+            spritesheets.append((file_name, cached_results, rectangle_keys))
+
+    jobs = []
+    # the cached results that each job's results go in
+    jobs_cached_results = []
+    for file_name, cached_results, rectangle_keys in spritesheets:
+        uncached_rectangle_keys = [
+            rectangle_key
+            for rectangle_key in rectangle_keys
+            if rectangle_key not in cached_results
+        ]
+        if len(uncached_rectangle_keys) > 0:
+            jobs.append(
+                (os.path.join(graphics_path, file_name), uncached_rectangle_keys)
+            )
+            jobs_cached_results.append(cached_results)
+    # workers only need PIL, which is already imported, so fork them
+    if not use_multiprocessing or len(jobs) < 2:
+        results = map(validate_rectangles, jobs)
+    else:
+        with multiprocessing.get_context("fork").Pool(
+            processes=multiprocessing.cpu_count()
+        ) as pool:
+            results = pool.map(validate_rectangles, jobs)
+    for cached_results, job_results in zip(jobs_cached_results, results):
+        cached_results.update(job_results)
+    save_cache(cache)
+
+    for file_name, cached_results, rectangle_keys in spritesheets:
+        out_of_bounds = [
+            rectangle_key
+            for rectangle_key in rectangle_keys
+            if cached_results[rectangle_key] == "out of bounds"
+        ]
+        if len(out_of_bounds) > 0:
+            errors.append(
+                file_name
+                + " doesn't contain sprites (x y w h): "
+                + ", ".join(out_of_bounds)
+            )
+        # construction states are often empty for parts of the industry that aren't built yet, so those aren't reported
+        if "_construction_" in file_name:
+            continue
+        transparent = [
+            rectangle_key
+            for rectangle_key in rectangle_keys
+            if cached_results[rectangle_key] == "transparent"
+        ]
+        if len(transparent) > 0:
+            utils.echo_message(
+                "[VALIDATE SPRITES] "
+                + file_name
+                + " has entirely transparent sprites (x y w h): "
+                + ", ".join(transparent)
+            )
+    if len(errors) > 0:
+        for error in errors:
+            utils.echo_message("[VALIDATE SPRITES] " + error)
+        raise Exception(
+            "Sprite validation failed for "
+            + str(len(errors))
+            + " spritesheets, see messages above"
+        )
@@ -0,0 +1,134 @@
+"""
+Long-lived build process for fast iteration: builds the registry and loads templates once, then polls src for changes.
+Changed industry or cargo modules are reloaded in place, and only the stages affected by a change are re-rendered.
+Changes to anything else in python (industry.py, economies, global_constants etc) restart the process, as too much depends on them.
+This renders lang, docs and nml only; compile the grf with make as usual (make will find the rendered files up to date).
+"""
+print("[WATCH] watching src for changes (ctrl-c to stop)")
+
+import os
+
+# templates must be re-read when they change on disk; chameleon reads this when it's imported, so set it before firs imports chameleon
+os.environ["CHAMELEON_RELOAD"] = "true"
+
+import sys
+import importlib
+import traceback
+from time import sleep
+
+import firs
+import render_lang
+import render_docs
+import render_nml
+
+src_path = os.path.join(os.curdir, "src")
+poll_interval = 0.5  # seconds
+
+
+def get_src_mtimes():
+    result = {}
+    for dirpath, dirnames, filenames in os.walk(src_path):
+        dirnames[:] = [dirname for dirname in dirnames if dirname != "__pycache__"]
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            result[file_path] = os.path.getmtime(file_path)
+    return result
+
+
+def reload_registered_module(module, registered_items, item_name):
+    # industry and cargo modules each declare one object (module.industry or module.cargo), which is registered by the package __init__
+    # the old object is removed while reloading, otherwise cargo's init-time guards find the stale copy of itself
+    old_item = getattr(module, item_name)
+    index = registered_items.index(old_item)
+    registered_items.remove(old_item)
+    new_item = None
+    try:
+        importlib.reload(module)
+        new_item = getattr(module, item_name)
+        # register the same way as the initial load, which runs the register-time checks (and resolves industry properties)
+        new_item.register()
+    except Exception:
+        # keep the old item, so the registry is still complete for the next change
+        if new_item in registered_items:
+            registered_items.remove(new_item)
+        registered_items.insert(index, old_item)
+        # the module must refer to the registered item, that's how the next reload finds it
+        setattr(module, item_name, old_item)
+        raise
+    # register() appends, so move the new item back to where the old item was in the registration order
+    registered_items.remove(new_item)
+    registered_items.insert(index, new_item)
+
+
+def reload_changes(changed_paths):
+    # reloads changed industry and cargo modules, and returns the stages to re-render, or None if the process needs to restart
+    stages = set()
+    for changed_path in changed_paths:
+        path_parts = os.path.relpath(changed_path, src_path).split(os.sep)
+        if path_parts[0] in ["industries", "cargos"] and path_parts[-1].endswith(".py"):
+            if path_parts[-1] == "__init__.py":
+                return None
+            module = sys.modules.get(path_parts[0] + "." + path_parts[-1][:-3])
+            if module is None:
+                # not registered (e.g. commented out in the package __init__), nothing to do
+                continue
+            if path_parts[0] == "industries":
+                reload_registered_module(module, firs.registered_industries, "industry")
+            else:
+                reload_registered_module(module, firs.registered_cargos, "cargo")
+            stages.update(["nml", "docs"])
+        elif path_parts[-1].endswith(".py"):
+            return None
+        elif path_parts[0] == "templates":
+            stages.add("nml")
+        elif path_parts[0] == "docs_templates":
+            stages.add("docs")
+        elif path_parts[0] == "lang_templates":
+            stages.add("lang")
+        elif path_parts[0] == "lang":
+            # docs use the strings from the english lang file
+            stages.update(["lang", "docs"])
+    return stages
+
+
+def main():
+    render_lang.main()
+    render_docs.main()
+    render_nml.main()
+    src_mtimes = get_src_mtimes()
+    while True:
+        sleep(poll_interval)
+        new_src_mtimes = get_src_mtimes()
+        changed_paths = [
+            file_path
+            for file_path, mtime in new_src_mtimes.items()
+            if src_mtimes.get(file_path) != mtime
+        ]
+        changed_paths.extend(
+            file_path for file_path in src_mtimes if file_path not in new_src_mtimes
+        )
+        src_mtimes = new_src_mtimes
+        if len(changed_paths) == 0:
+            continue
+        print("[WATCH] changed: " + ", ".join(sorted(changed_paths)))
+        try:
+            stages = reload_changes(changed_paths)
+            if stages is None:
+                print("[WATCH] restarting")
+                os.execv(sys.executable, [sys.executable] + sys.argv)
+            if len(stages) > 0:
+                firs.build_cross_references()
+            # same order as make, lang then docs then nml
+            if "lang" in stages:
+                render_lang.main()
+            if "docs" in stages:
+                render_docs.main()
+            if "nml" in stages:
+                render_nml.main()
+        except Exception:
+            # keep watching, the next save will probably fix it
+            traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+# the render scripts run from the repo root with src on the module search path (as the makefile runs them), tests do the same
+# but from a temporary dir linking to the repo, so the generated files and caches the src modules write (relative to the current dir) don't end up in the repo
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+build_outputs = [".chameleon_cache", ".nmlcache", "docs", "generated"]
+working_dir = tempfile.TemporaryDirectory(prefix="firs_tests_")
+for file_name in os.listdir(repo_path):
+    if file_name not in build_outputs:
+        os.symlink(
+            os.path.join(repo_path, file_name),
+            os.path.join(working_dir.name, file_name),
+        )
+os.chdir(working_dir.name)
+sys.path.insert(0, os.path.join(repo_path, "src"))
+# the src modules read the makefile args from sys.argv, which would otherwise be pytest's args
+del sys.argv[1:]
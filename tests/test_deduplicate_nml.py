@@ -0,0 +1,32 @@
+import deduplicate_nml
+
+# the same switches in two industries' nml, the second industry's refer to its own names
+industry_nml = """switch (FEAT_INDUSTRIES, SELF, {id}_lc_1, [LOAD_PERM(1) > 3]) {{
+    1: return CB_RESULT_LOCATION_DISALLOW;
+    return CB_RESULT_LOCATION_ALLOW;
+}}
+switch (FEAT_INDUSTRIES, SELF, {id}_lc_0, current_year) {{
+    // {id} comments are ignored
+    1900..2000: {id}_lc_1;
+    return CB_RESULT_LOCATION_DISALLOW;
+}}
+item (FEAT_INDUSTRIES, {id}) {{
+    property {{ name: string(STR_{id}); }}
+    graphics {{ location_check: {id}_lc_0; }}
+}}"""
+fragments = [
+    industry_nml.format(id="coal_mine"),
+    "\n" + industry_nml.format(id="iron_ore_mine"),
+    "\nswitch (FEAT_INDUSTRIES, SELF, forest_lc_0, random_bits) { return 1; }",
+]
+
+
+def test_deduplicating_files_in_turn_matches_deduplicating_the_linked_nml():
+    expected, removed_count = deduplicate_nml.deduplicate_switches("".join(fragments))
+    assert removed_count == 2
+    assert "iron_ore_mine_lc_" not in expected
+    assert "location_check: coal_mine_lc_0;" in expected
+    switch_deduplicator = deduplicate_nml.SwitchDeduplicator()
+    result = [switch_deduplicator.deduplicate(fragment) for fragment in fragments]
+    assert "".join(result) == expected
+    assert switch_deduplicator.removed_count == removed_count
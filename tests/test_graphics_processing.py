@@ -0,0 +1,133 @@
+import os
+
+import pytest
+from PIL import Image
+
+from polar_fox import constants
+from polar_fox import graphics_units as polar_fox_graphics_units
+from polar_fox import pixa
+from graphics_processing import graphics_units as fast_graphics_units
+from graphics_processing import pixa as fast_pixa
+
+# the graphics_processing versions only differ from polar_fox when numpy is installed
+numpy = pytest.importorskip("numpy")
+
+spritesheet_path = os.path.join(
+    "src", "graphics", "industries", "aluminium_plant_1.png"
+)
+
+
+def test_pixascan_is_unchanged():
+    image = Image.open(spritesheet_path)
+    expected = pixa.pixascan(image)
+    assert len(expected) > 0
+    assert fast_pixa.pixascan(image) == expected
+    # images that aren't single band are scanned by polar_fox
+    assert fast_pixa.pixascan(image.convert("RGB")) == pixa.pixascan(
+        image.convert("RGB")
+    )
+
+
+def test_pixascan_array_has_the_same_pixels():
+    image = Image.open(spritesheet_path)
+    significant_pixels = fast_pixa.pixascan_array(image)
+    assert significant_pixels.dtype["x"] == numpy.uint16
+    assert [tuple(row) for row in significant_pixels.tolist()] == pixa.pixascan(image)
+
+
+def get_piece_cargo_sprites():
+    # piece cargo spritesheets are sliced into sprites for each angle the cargo is drawn at
+    polar_fox_graphics_path = os.path.join("src", "polar_fox", "graphics")
+    return (
+        pixa.PieceCargoSprites(constants, polar_fox_graphics_path),
+        fast_pixa.PieceCargoSprites(constants, polar_fox_graphics_path),
+    )
+
+
+def assert_images_are_identical(image, expected):
+    assert image.mode == expected.mode
+    assert image.size == expected.size
+    assert image.getpalette() == expected.getpalette()
+    assert image.tobytes() == expected.tobytes()
+
+
+def test_get_arbitrary_angles_is_unchanged():
+    piece_cargo_sprites, fast_piece_cargo_sprites = get_piece_cargo_sprites()
+    for cargo_filename in piece_cargo_sprites.sprites_by_filename:
+        for length in piece_cargo_sprites.cargo_spritesheet_bounding_boxes:
+            expected = piece_cargo_sprites.get_cargo_sprites_all_angles_for_length(
+                cargo_filename, length
+            )
+            result = fast_piece_cargo_sprites.get_cargo_sprites_all_angles_for_length(
+                cargo_filename, length
+            )
+            assert len(result) == len(expected)
+            for (sprite, mask), (expected_sprite, expected_mask) in zip(
+                result, expected
+            ):
+                assert_images_are_identical(sprite, expected_sprite)
+                assert_images_are_identical(mask, expected_mask)
+
+
+def test_get_arbitrary_angles_padded_and_rgb_sprites_are_unchanged():
+    # boxes that extend past the image, and images that aren't single band, don't use numpy
+    image = Image.open(spritesheet_path)
+    bounding_boxes = [
+        (0, 0, 64, 64),
+        (image.size[0] - 32, 100, image.size[0] + 32, 180),
+    ]
+    for input_image in [image, image.convert("RGB")]:
+        for (sprite, mask), (expected_sprite, expected_mask) in zip(
+            fast_pixa.get_arbitrary_angles(input_image, bounding_boxes),
+            pixa.get_arbitrary_angles(input_image, bounding_boxes),
+        ):
+            assert_images_are_identical(sprite, expected_sprite)
+            assert_images_are_identical(mask, expected_mask)
+
+
+def render_units(units, input_image):
+    spritesheet = pixa.make_spritesheet_from_image(
+        input_image, input_image.getpalette()
+    )
+    for unit in units:
+        spritesheet = unit.render(spritesheet)
+    return spritesheet.sprites
+
+
+def test_fused_recolour_units_are_unchanged():
+    input_image = Image.open(spritesheet_path)
+    recolour_map = {i: i + 16 for i in range(16, 240, 3)}
+    polar_fox_units = [
+        polar_fox_graphics_units.SimpleRecolour(recolour_map),
+        polar_fox_graphics_units.SwapCompanyColours(),
+        polar_fox_graphics_units.PassThrough(),
+        polar_fox_graphics_units.SimpleRecolour({i: i + 1 for i in range(16, 64)}),
+        polar_fox_graphics_units.SwapCompanyColours(),
+        polar_fox_graphics_units.SimpleRecolour(recolour_map),
+    ]
+    # polar_fox recolour units are fused as well as the FIRS ones
+    units = polar_fox_units[0:3] + [
+        fast_graphics_units.SimpleRecolour({i: i + 1 for i in range(16, 64)}),
+        fast_graphics_units.SwapCompanyColours(),
+        polar_fox_units[5],
+    ]
+    fused_units = fast_graphics_units.fuse_recolour_units(units)
+    assert [unit.__class__.__name__ for unit in fused_units] == [
+        "FusedRecolour",
+        "PassThrough",
+        "FusedRecolour",
+    ]
+    assert_images_are_identical(
+        render_units(fused_units, input_image),
+        render_units(polar_fox_units, input_image),
+    )
+    # swapping company colours twice changes nothing, so no pass is needed at all
+    assert (
+        fast_graphics_units.fuse_recolour_units(
+            [
+                fast_graphics_units.SwapCompanyColours(),
+                polar_fox_graphics_units.SwapCompanyColours(),
+            ]
+        )
+        == []
+    )
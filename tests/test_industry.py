@@ -0,0 +1,19 @@
+import pytest
+
+import industry
+
+
+def test_houses_nearby_search_rejects_keys_the_pattern_doesnt_take():
+    with pytest.raises(Exception) as error:
+        industry.get_houses_nearby_search_points(
+            dict(pattern="square", distance=3, step=2), "hotel"
+        )
+    assert str(error.value) == (
+        "hotel require_houses_nearby search has step,"
+        " which the square pattern doesn't take (it takes distance)"
+    )
+    assert len(
+        industry.get_houses_nearby_search_points(
+            dict(pattern="ring", distance=3, step=2), "hotel"
+        )
+    ) == len(industry.get_ring_search_points(3, 2))
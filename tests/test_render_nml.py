@@ -0,0 +1,64 @@
+import shutil
+
+import pytest
+
+import render_nml
+
+
+@pytest.fixture
+def src_copy(tmp_path, monkeypatch):
+    # the hashes read src relative to the current dir, so a copy of src can be edited without touching the real one
+    shutil.copytree(
+        "src",
+        tmp_path / "src",
+        ignore=shutil.ignore_patterns("graphics", "__pycache__"),
+    )
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "src"
+
+
+def edit_file(path, old, new):
+    content = path.read_text(encoding="utf8")
+    assert old in content
+    path.write_text(content.replace(old, new, 1), encoding="utf8")
+
+
+def test_header_item_hashes_change_when_global_constants_change(src_copy):
+    # cargos.pynml doesn't name global_constants, but reads valid_cargo_colours through cargo.get_cargo_colour()
+    industry_nml_hashes = {"coal_mine": "a"}
+    hashes = render_nml.get_header_item_nml_hashes(
+        render_nml.header_items, industry_nml_hashes
+    )
+    edit_file(
+        src_copy / "global_constants.py",
+        "valid_cargo_colours = [\n    152,",
+        "valid_cargo_colours = [\n    153,",
+    )
+    new_hashes = render_nml.get_header_item_nml_hashes(
+        render_nml.header_items, industry_nml_hashes
+    )
+    for header_item in render_nml.header_items:
+        assert new_hashes[header_item] != hashes[header_item], header_item
+
+
+def test_header_item_hashes_change_when_a_module_used_by_cargos_changes(src_copy):
+    hashes = render_nml.get_header_item_nml_hashes(render_nml.header_items, {})
+    edit_file(
+        src_copy / "cargo.py",
+        "def get_cargo_colour(self, economy):",
+        "def get_cargo_colour(self, economy):\n        pass",
+    )
+    new_hashes = render_nml.get_header_item_nml_hashes(render_nml.header_items, {})
+    assert new_hashes["cargos"] != hashes["cargos"]
+
+
+def test_header_item_hashes_only_change_for_industries_where_industries_are_read():
+    # an industry edit changes the industry nml hashes, but shouldn't re-render header items that don't read industries
+    hashes = render_nml.get_header_item_nml_hashes(
+        render_nml.header_items, {"coal_mine": "a"}
+    )
+    new_hashes = render_nml.get_header_item_nml_hashes(
+        render_nml.header_items, {"coal_mine": "b"}
+    )
+    assert new_hashes["cargos"] == hashes["cargos"]
+    assert new_hashes["ground_tiles"] != hashes["ground_tiles"]
@@ -0,0 +1,91 @@
+import io
+
+import utils
+
+
+def unescape_chameleon_output_before_streaming(escaped_nml):
+    # the implementation that UnescapedChameleonOutputWriter replaced, to check the output is unchanged
+    escaped_nml = "\n".join(
+        [x for x in escaped_nml.split("\n") if x.strip(" \t\n\r") != ""]
+    )
+    escaped_nml = ">".join(escaped_nml.split("&gt;"))
+    escaped_nml = "<".join(escaped_nml.split("&lt;"))
+    escaped_nml = "&".join(escaped_nml.split("&amp;"))
+    return escaped_nml
+
+
+# representative chameleon output: indented blocks, whitespace-only lines, entities in expressions and strings
+escaped_nml = """
+        switch (FEAT_INDUSTRIES, SELF, coal_mine_switch_0, [
+            STORE_TEMP(LOAD_PERM(0) &gt;= 8 &amp;&amp; LOAD_PERM(1) &lt; 3, 0x100)
+        ]) {
+            1: return CB_RESULT_LOCATION_DISALLOW;
+\t
+            coal_mine_switch_1;
+        }
+   \r
+        // literal entities survive a single unescape: &amp;lt; &amp;gt; &amp;amp; &&amp;&amp;;
+        STR_NAME_COAL_MINE: "Kohlebergwerk &amp; Zeche – Förderturm ≥ 3 ⛏"
+\t\t
+        spriteset(coal_mine_spriteset_0) { [10, 10, 64, 59, -31, -28, ANIM | NOCROP, "generated/graphics/industries/coal_mine_1.png"] }
+"""
+
+
+def unescape_with_writer(chunks):
+    output_file = io.StringIO()
+    # close() closes the wrapped file, so keep the content before it's gone
+    output_file.close = lambda: None
+    writer = utils.UnescapedChameleonOutputWriter(output_file)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+    return output_file.getvalue()
+
+
+def test_unescape_chameleon_output_is_unchanged():
+    expected = unescape_chameleon_output_before_streaming(escaped_nml)
+    assert utils.unescape_chameleon_output(escaped_nml) == expected
+    assert "&lt; &gt; &amp; &&&;" in expected
+    assert "Förderturm ≥ 3 ⛏" in expected
+
+
+def test_writer_matches_unescape_chameleon_output_in_one_write():
+    expected = unescape_chameleon_output_before_streaming(escaped_nml)
+    assert unescape_with_writer([escaped_nml]) == expected
+    assert unescape_with_writer([]) == unescape_chameleon_output_before_streaming("")
+
+
+def test_writer_matches_unescape_chameleon_output_split_anywhere():
+    # every split point, which includes splits inside each entity, each line break, and around multi-byte characters
+    expected = unescape_chameleon_output_before_streaming(escaped_nml)
+    for split_at in range(len(escaped_nml) + 1):
+        assert (
+            unescape_with_writer([escaped_nml[:split_at], escaped_nml[split_at:]])
+            == expected
+        )
+
+
+def test_writer_matches_unescape_chameleon_output_in_small_chunks():
+    expected = unescape_chameleon_output_before_streaming(escaped_nml)
+    for chunk_size in range(1, 8):
+        chunks = [
+            escaped_nml[i : i + chunk_size]
+            for i in range(0, len(escaped_nml), chunk_size)
+        ]
+        assert unescape_with_writer(chunks) == expected
+
+
+def test_writer_unescapes_one_large_write_a_chunk_at_a_time(monkeypatch):
+    # a single write of a whole template's output is unescaped in chunks, which can split entities and lines anywhere
+    expected = unescape_chameleon_output_before_streaming(escaped_nml)
+    for chunk_size in range(1, 8):
+        monkeypatch.setattr(
+            utils.UnescapedChameleonOutputWriter, "chunk_size", chunk_size
+        )
+        assert unescape_with_writer([escaped_nml]) == expected
+    monkeypatch.undo()
+    large_escaped_nml = escaped_nml * 1000
+    assert len(large_escaped_nml) > utils.UnescapedChameleonOutputWriter.chunk_size
+    assert unescape_with_writer(
+        [large_escaped_nml]
+    ) == unescape_chameleon_output_before_streaming(large_escaped_nml)